@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Process-wide cache for prepared logo assets (flame masks, pre-blended flame layers)
+
+Entries are kept in a bounded LRU in memory and can optionally be persisted as
+.npz files so later runs skip flame extraction entirely.
+"""
+import os
+import hashlib
+from collections import OrderedDict
+
+from atomic_files import atomic_write
+from instrumentation import get_logger
+from lazy_modules import lazy_import
+
+np = lazy_import("numpy")
+
+log = get_logger("asset_cache")
+
+def file_fingerprint(path):
+    """Return (absolute path, mtime_ns, size) for a file, or None if it can't be read"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+_digests = {}
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file's contents, memoized by its fingerprint"""
+    fingerprint = file_fingerprint(path)
+    if fingerprint is None:
+        return None
+    if fingerprint not in _digests:
+        with open(path, "rb") as f:
+            _digests[fingerprint] = hashlib.sha256(f.read()).hexdigest()
+    return _digests[fingerprint]
+
+class AssetCache:
+    """Bounded LRU of named numpy arrays, optionally backed by an on-disk .npz store
+
+    Args:
+        max_entries: Maximum number of entries kept in memory before the least
+            recently used one is evicted
+        cache_dir: Directory for persisted .npz entries, or None for memory only
+    """
+
+    def __init__(self, max_entries=16, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.npz")
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return {name: data[name] for name in data.files}
+        except Exception as e:
+            log.warning("Ignoring unreadable asset cache file %s: %s", path, e)
+            return None
+
+    def _save(self, key, arrays):
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Concurrent readers never see a partial file
+            with atomic_write(self._disk_path(key), "wb") as f:
+                np.savez(f, **arrays)
+        except Exception as e:
+            log.warning("Could not persist asset cache entry: %s", e)
+
+    def get(self, key, build):
+        """Return the arrays cached under key, calling build() to create them on a miss
+
+        Args:
+            key: Hashable key; its repr() names the on-disk entry, so it must be stable
+            build: Callable returning a dict of name -> numpy array
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        self.misses += 1
+        arrays = self._load(key)
+        if arrays is None:
+            arrays = build()
+            self._save(key, arrays)
+
+        self._entries[key] = arrays
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return arrays
+
+    def clear(self):
+        """Drop all in-memory entries (persisted files are left alone)"""
+        self._entries.clear()
+
+# Shared cache used by qr_generator
+default_cache = AssetCache()
+
+def configure(max_entries=None, cache_dir=None):
+    """Adjust the shared cache's size limit and on-disk directory"""
+    if max_entries is not None:
+        default_cache.max_entries = max_entries
+    if cache_dir is not None:
+        default_cache.cache_dir = cache_dir
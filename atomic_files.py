@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""
+Atomic file replacement for manifests, progress files and cached assets
+
+Files are written to a temporary file in the target's directory and renamed
+over the target, so an interrupt never leaves a truncated file and concurrent
+readers see either the old contents or the new ones.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Read once at import: querying the umask means briefly changing it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """Open a file that replaces path when the with block completes
+
+    If the block raises, path is left untouched and the temporary file is removed.
+    The new file gets the usual permissions for the umask, like open() would,
+    rather than mkstemp's owner-only 0600.
+
+    Args:
+        path: File to create or replace
+        mode: "w" for text or "wb" for binary
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
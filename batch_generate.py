@@ -5,47 +5,403 @@ This script generates multiple QR codes for a list of URLs
 """
 import os
 import sys
+import time
 import argparse
-from qr_generator import create_qr_in_flame
+from collections import deque
+from multiprocessing import Pool
+import asset_cache
+import qr_cache
+import instrumentation
+from build_manifest import BuildManifest
+from manifest import read_manifest, load_progress, save_progress
+from output_sinks import ArchiveSink, archive_format
+from print_sheets import SheetLayout, SheetWriter, parse_grid, parse_page_size
+from qr_generator import (LABEL_STYLE, INDEXED_MODES, FLAME_MODES, render_qr_in_flame,
+                          render_png_bytes, render_label_indexed, encode_indexed_png,
+                          build_label_template, render_label_sizes, parse_sizes, sized_output_path,
+                          scaled_style, save_png, label_digest, label_filename, configure_caches)
+from vector_renderer import create_label_svg, render_label_svg
+from verification import ScanVerifier
+
+log = instrumentation.get_logger("batch")
+
+def init_worker(logo_path, cache_dir=None, qr_cache_path=None, instrumentation_settings=None):
+    """Pool initializer: load and prepare the logo once per worker process"""
+    if instrumentation_settings:
+        # Forked workers inherit the parent's counters; start from zero
+        instrumentation.default.reset()
+        instrumentation.configure(**instrumentation_settings)
+    configure_caches(cache_dir, qr_cache_path)
+    build_label_template(logo_path)
+
+def generate_label(task):
+    """Render one label, returning (task, created_file, error) instead of raising
+
+    Args:
+        task: Dict with logo_path, url, output_path, manufacturer, model, serial,
+            format ("png" or "svg"), png_compression and, for palette/1-bit PNGs,
+            color_mode, label_px and flame. Multi-size tasks also carry sizes and
+            output_paths; created_file is then the first (primary) size.
+    """
+    try:
+        with instrumentation.span("label", row=task.get("row")):
+            created_file, _ = _create_label_file(task)
+        return task, created_file, None
+    except Exception as e:
+        return task, None, str(e)
+
+def _create_label_file(task):
+    """Render a task's label and write its file(s), returning (created_file, label)
+
+    label is the label as written, so it can be checked without reading the file
+    back: a BGR array (the primary size's for multi-size tasks), the encoded PNG
+    for palette/1-bit labels, or None for SVG.
+    """
+    if task.get("format") == "svg":
+        return create_label_svg(task["logo_path"], task["url"], task["output_path"],
+                                task["manufacturer"], task["model"], task["serial"]), None
+    if task.get("sizes"):
+        labels = render_label_sizes(task["logo_path"], task["url"], task["sizes"], task["manufacturer"],
+                                    task["model"], task["serial"])
+        with instrumentation.span("png_write"):
+            for path, size in zip(task["output_paths"], task["sizes"]):
+                save_png(path, labels[size], task.get("png_compression"))
+        return task["output_paths"][0], labels[task["sizes"][0]]
+    if task.get("color_mode", "color") in INDEXED_MODES:
+        label = _encode_label(task)
+    else:
+        label = render_qr_in_flame(task["logo_path"], task["url"], task["manufacturer"],
+                                   task["model"], task["serial"])
+    with instrumentation.span("png_write"):
+        save_png(task["output_path"], label, task.get("png_compression"))
+    return task["output_path"], label
+
+def render_label(task):
+    """Render one label in memory, returning (task, label_array, error) instead of raising
+
+    If task["label_size"] is set (e.g. a print-sheet slot), the label is laid out and
+    drawn at that many pixels (see scaled_style) rather than resampled.
+    """
+    try:
+        with instrumentation.span("label", row=task.get("row")):
+            size = task.get("label_size")
+            label = render_qr_in_flame(task["logo_path"], task["url"],
+                                       task["manufacturer"], task["model"], task["serial"],
+                                       scaled_style(size) if size else None)
+        return task, label, None
+    except Exception as e:
+        return task, None, str(e)
+
+def render_label_bytes(task):
+    """Render one label to encoded file contents, returning (task, data, error)"""
+    try:
+        with instrumentation.span("label", row=task.get("row")):
+            data = _encode_label(task)
+        return task, data, None
+    except Exception as e:
+        return task, None, str(e)
+
+def _encode_label(task):
+    if task.get("format") == "svg":
+        return render_label_svg(task["logo_path"], task["url"], task["manufacturer"],
+                                task["model"], task["serial"]).encode("utf-8")
+    if task.get("color_mode", "color") in INDEXED_MODES:
+        indices, palette = render_label_indexed(task["logo_path"], task["url"], task["manufacturer"],
+                                                task["model"], task["serial"], task["color_mode"],
+                                                task.get("label_px"), flame=task.get("flame", "dither"))
+        return encode_indexed_png(indices, palette)
+    return render_png_bytes(task["logo_path"], task["url"], task["manufacturer"],
+                            task["model"], task["serial"], compression=task.get("png_compression"))
+
+def run_batch(tasks, jobs=1, logo_path=None, cache_dir=None, qr_cache_path=None, worker=generate_label):
+    """Render tasks sequentially or across a process pool, yielding results in input order
+
+    tasks may be any iterable (including a generator over a large manifest); only a
+    few tasks per worker are in flight at once, so memory stays bounded.
+    """
+    if jobs <= 1:
+        yield from map(worker, tasks)
+        return
+
+    max_pending = jobs * 4
+    initargs = (logo_path, cache_dir, qr_cache_path, instrumentation.settings())
+    with Pool(processes=jobs, initializer=init_worker, initargs=initargs) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(worker, (task,)))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+def run_files(tasks, jobs=1, logo_path=None, cache_dir=None, qr_cache_path=None, verifier=None):
+    """Write one file per label, yielding (task, created_file, error) in input order
+
+    In a single process, sampled labels are handed to verifier (a ScanVerifier) as
+    rendered, without reading the file back. Pool workers only send back the path,
+    so their labels are checked from the written file instead.
+    """
+    if jobs <= 1:
+        for task in tasks:
+            try:
+                with instrumentation.span("label", row=task.get("row")):
+                    created_file, label = _create_label_file(task)
+            except Exception as e:
+                yield task, None, str(e)
+                continue
+            if verifier and verifier.wants(task):
+                verifier.submit(task, label)
+            yield task, created_file, None
+        return
+
+    for task, created_file, error in run_batch(tasks, jobs, logo_path, cache_dir, qr_cache_path):
+        if not error and verifier and verifier.wants(task):
+            # Still in the page cache, having just been written
+            verifier.submit(task, created_file)
+        yield task, created_file, error
+
+def run_sheets(tasks, writer, jobs=1, logo_path=None, cache_dir=None, qr_cache_path=None, verifier=None):
+    """Impose labels onto print sheets, yielding (task, location, error) in input order
+
+    Labels are laid out and drawn at the slot size (see scaled_style), so text and
+    QR modules land on printer pixels. In a single process each label is drawn
+    straight into its sheet slot; pool workers send back rendered labels instead.
+    Sampled labels are handed to verifier (a ScanVerifier) as placed on the sheet.
+    """
+    def location():
+        page = writer.pages_written + 1
+        return f"{writer.fmt} sheet {page}, slot {writer.labels_placed % writer.layout.labels_per_page + 1}"
+
+    if jobs <= 1:
+        style = scaled_style(writer.layout.slot_size)
+        for task in tasks:
+            where = location()
+            try:
+                with instrumentation.span("label", row=task.get("row")):
+                    render_qr_in_flame(task["logo_path"], task["url"], task["manufacturer"],
+                                       task["model"], task["serial"], style, out=writer.current_slot())
+            except Exception as e:
+                writer.clear_slot()
+                yield task, None, str(e)
+                continue
+            if verifier and verifier.wants(task):
+                # The slot is reused once the page is written out
+                verifier.submit(task, writer.current_slot().copy())
+            writer.advance()
+            yield task, where, None
+        return
+
+    slot_tasks = (dict(task, label_size=writer.layout.slot_size) for task in tasks)
+    for task, label, error in run_batch(slot_tasks, jobs, logo_path, cache_dir, qr_cache_path,
+                                        worker=render_label):
+        if error:
+            yield task, None, error
+            continue
+        where = location()
+        if verifier and verifier.wants(task):
+            verifier.submit(task, label)
+        writer.place(label)
+        yield task, where, None
+
+def run_archive(tasks, sink, jobs=1, logo_path=None, cache_dir=None, qr_cache_path=None, verifier=None):
+    """Stream labels into an archive, yielding (task, location, error) in input order
+
+    In a single process, rendered color labels are handed to the sink's writer thread
+    for encoding so it overlaps with rendering; pool workers encode their own labels.
+    Sampled labels are handed to verifier (a ScanVerifier) as written to the archive.
+    """
+    raster_in_process = jobs <= 1
+    def worker(task):
+        if raster_in_process and task.get("format") != "svg" and task.get("color_mode", "color") == "color":
+            return render_label(task)
+        return render_label_bytes(task)
+
+    for task, data, error in run_batch(tasks, jobs, logo_path, cache_dir, qr_cache_path,
+                                       worker=worker if raster_in_process else render_label_bytes):
+        if error:
+            yield task, None, error
+            continue
+        name = os.path.basename(task["output_path"])
+        if verifier and verifier.wants(task):
+            verifier.submit(task, data)
+        if isinstance(data, bytes):
+            sink.add_bytes(name, data)
+        else:
+            sink.add_label(name, data)
+        yield task, f"{sink.path}:{name}", None
+
+def print_stats(jobs, rate):
+    """Print the stage timings, counters and cache hit rates recorded in this process"""
+    summary = instrumentation.default.summary()
+    print("\nStage timings" + (" (main process; see --trace for workers)" if jobs > 1 else "") + ":")
+    for name, span in sorted(summary["spans"].items(), key=lambda item: -item[1]["total_ms"]):
+        print(f"  {name:<12} {span['count']:>7} x {span['mean_ms']:8.3f} ms = {span['total_ms'] / 1000:8.2f} s"
+              f"  (max {span['max_ms']:.2f} ms)")
+    print("Counters:")
+    for name, value in sorted(summary["counters"].items()):
+        print(f"  {name:<16} {value}")
+    print(f"  {'labels_per_sec':<16} {rate:.1f}")
+    if jobs <= 1:
+        assets = asset_cache.default_cache
+        qr = qr_cache.default_cache.stats()
+        print(f"Caches: assets {assets.hits} hits / {assets.misses} misses, "
+              f"QR {qr['hits'] + qr['disk_hits']} hits / {qr['misses']} misses")
+
+# How often (in labels) the build manifest is flushed to disk during a run
+BUILD_MANIFEST_SAVE_INTERVAL = 100
+
+def output_path_for(output_dir, item, digest, fmt="png"):
+    """Pick the output file for a label, honouring a per-item output name"""
+    name = item.get("output") or label_filename(digest)
+    # The extension always follows the output format
+    return os.path.join(output_dir, f"{os.path.splitext(name)[0]}.{fmt}")
+
+def label_outputs(task):
+    """Files a task writes: one per size for multi-size tasks, otherwise its output_path"""
+    return task.get("output_paths") or [task["output_path"]]
 
 def main():
     parser = argparse.ArgumentParser(description='Generate QR codes within the Mary Bird Perkins logo flame')
     parser.add_argument('-f', '--file', help='File containing URLs (one per line)')
     parser.add_argument('-u', '--urls', nargs='+', help='List of URLs to encode')
+    parser.add_argument('--manifest', help='JSONL or CSV file with url/manufacturer/model/serial/output per row')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted --manifest run from the last completed row')
     parser.add_argument('-o', '--output', default='Generated_QR', help='Output directory')
     parser.add_argument('-m', '--manufacturer', default="", help='Equipment manufacturer name')
     parser.add_argument('-d', '--model', default="", help='Equipment model number')
     parser.add_argument('-s', '--serial', default="", help='Equipment serial number')
+    parser.add_argument('--cache-dir', help='Directory to persist prepared logo assets between runs')
+    parser.add_argument('--qr-cache', help='SQLite file to persist encoded QR codes between runs')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of worker processes (0 = one per CPU core)')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-render every label, even if its inputs are unchanged')
+    parser.add_argument('--format', choices=['png', 'svg'], default='png',
+                        help='Per-label output format: raster PNG or vector SVG (default: png)')
+    parser.add_argument('--color-mode', choices=['color'] + list(INDEXED_MODES), default='color',
+                        help='PNG color mode: full color, a small palette, or 1-bit black/white for '
+                             'thermal label printers (default: color)')
+    parser.add_argument('--label-px', type=int,
+                        help='Label size in pixels for palette/1-bit output, e.g. the label width '
+                             'at the printer\'s native DPI (default: 800)')
+    parser.add_argument('--flame', choices=FLAME_MODES, default='dither',
+                        help='Flame rendering for palette/1-bit output (default: dither)')
+    parser.add_argument('--sizes',
+                        help='Write each label at several pixel sizes from one render, e.g. 800,256,96 '
+                             '(files are named NAME_<size>px.png)')
+    parser.add_argument('--png-compression', type=int, choices=range(10), metavar='{0-9}',
+                        help='PNG zlib level: 0 is fastest, 9 smallest (default: OpenCV default)')
+    parser.add_argument('--archive',
+                        help='Write all labels into one .zip/.tar/.tar.gz archive (inside the output directory)')
+    parser.add_argument('--sheets', choices=['pdf', 'png'],
+                        help='Tile labels onto print sheets instead of writing one file per label')
+    parser.add_argument('--sheet-page', default='letter',
+                        help='Sheet page size: letter, legal, a4 or WxH in inches (default: letter)')
+    parser.add_argument('--sheet-grid', default='3x4', help='Labels per sheet as COLSxROWS (default: 3x4)')
+    parser.add_argument('--sheet-margin', type=float, default=0.15,
+                        help='Sheet margin in inches (default: 0.15)')
+    parser.add_argument('--sheet-dpi', type=int, default=300, help='Printer resolution (default: 300)')
+    parser.add_argument('--verify', action='store_true',
+                        help='Decode rendered labels in the background and report any that do not scan '
+                             'back to their URL')
+    parser.add_argument('--verify-rate', type=float, default=1.0,
+                        help='Fraction of labels to verify, evenly spaced (default: 1 = every label)')
+    parser.add_argument('--verify-workers', type=int, default=0,
+                        help='Decoder threads for --verify (0 = half the CPU cores)')
+    parser.add_argument('--log-level', choices=list(instrumentation.LEVELS), default='info',
+                        help='Output detail: debug shows every rendering step, silent prints nothing '
+                             '(default: info)')
+    parser.add_argument('-q', '--quiet', dest='log_level', action='store_const', const='warning',
+                        help='Only report problems (same as --log-level warning)')
+    parser.add_argument('-v', '--verbose', dest='log_level', action='store_const', const='debug',
+                        help='Show every rendering step (same as --log-level debug)')
+    parser.add_argument('--stats', action='store_true',
+                        help='Time each rendering stage and print a summary at the end')
+    parser.add_argument('--trace', help='Append per-label timing spans to this JSON lines trace file')
     
     args = parser.parse_args()
     
-    if not args.file and not args.urls:
+    instrumentation.configure(args.log_level, timing=args.stats, trace_path=args.trace)
+    
+    if not args.file and not args.urls and not args.manifest:
         parser.print_help()
-        print("\nError: You must provide either a file with URLs or a list of URLs")
+        print("\nError: You must provide a file with URLs, a list of URLs or a manifest")
+        sys.exit(1)
+    
+    if args.manifest and (args.file or args.urls):
+        print("Error: --manifest can't be combined with -f/--file or -u/--urls")
+        sys.exit(1)
+    
+    if args.resume and not args.manifest:
+        print("Error: --resume only applies to --manifest runs")
+        sys.exit(1)
+    
+    if args.resume and args.sheets:
+        print("Error: --resume can't be used with --sheets (sheets are always laid out from the first row)")
+        sys.exit(1)
+    
+    if args.archive and args.sheets:
+        print("Error: choose either --archive or --sheets")
+        sys.exit(1)
+    
+    if args.resume and args.archive:
+        print("Error: --resume can't be used with --archive (the archive is rewritten on every run)")
         sys.exit(1)
-        
-    urls = []
     
-    # Get URLs from file if provided
-    if args.file:
+    if args.archive:
         try:
-            with open(args.file, 'r') as f:
-                urls.extend([line.strip() for line in f if line.strip()])
-        except FileNotFoundError:
-            print(f"Error: File {args.file} not found")
+            archive_format(args.archive)
+        except ValueError as e:
+            print(f"Error: {e}")
             sys.exit(1)
     
-    # Add URLs from command line
-    if args.urls:
-        urls.extend(args.urls)
+    if args.sheets and args.format != 'png':
+        print("Error: --sheets lays out raster labels and can't be combined with --format svg")
+        sys.exit(1)
+    
+    if args.verify and args.format != 'png':
+        print("Error: --verify decodes raster labels and can't be combined with --format svg")
+        sys.exit(1)
+    
+    if not 0 < args.verify_rate <= 1:
+        print("Error: --verify-rate must be greater than 0 and at most 1")
+        sys.exit(1)
     
-    # Remove duplicates while preserving order
-    urls = list(dict.fromkeys(urls))
+    if args.color_mode != 'color' and (args.format != 'png' or args.sheets):
+        print("Error: --color-mode palette/1bit only applies to per-label PNG output (not --sheets or svg)")
+        sys.exit(1)
+    
+    if args.label_px is not None and args.color_mode == 'color':
+        print("Error: --label-px requires --color-mode palette or 1bit")
+        sys.exit(1)
     
-    if not urls:
-        print("No valid URLs found. Exiting.")
+    if args.color_mode != 'color' and args.png_compression is not None:
+        print("Error: --png-compression only applies to --color-mode color")
         sys.exit(1)
     
+    sizes = None
+    if args.sizes:
+        if args.format != 'png' or args.sheets or args.archive or args.color_mode != 'color':
+            print("Error: --sizes only applies to per-label color PNG output "
+                  "(not --sheets, --archive, svg or palette/1bit)")
+            sys.exit(1)
+        try:
+            sizes = parse_sizes(args.sizes)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    
+    sheet_layout = None
+    if args.sheets:
+        try:
+            columns, rows = parse_grid(args.sheet_grid)
+            sheet_layout = SheetLayout(parse_page_size(args.sheet_page), args.sheet_dpi, columns, rows,
+                                       args.sheet_margin)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    
     # Create output directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
     logo_path = os.path.join(script_dir, 'Resources', 'Mary Bird Perkins Cancer Center.png')
@@ -53,15 +409,213 @@ def main():
     
     os.makedirs(output_dir, exist_ok=True)
     
-    # Generate QR codes for each URL
-    for url in urls:
-        print(f"Generating QR code for: {url}")
-        output_path = os.path.join(output_dir, f'qr_in_flame_{hash(url) % 10000}.png')
-        created_file = create_qr_in_flame(logo_path, url, output_path, 
-                                         args.manufacturer, args.model, args.serial)
-        print(f"  → Created: {created_file}")
+    if args.manifest:
+        if not os.path.exists(args.manifest):
+            print(f"Error: Manifest {args.manifest} not found")
+            sys.exit(1)
+        
+        # Progress is tracked per manifest inside the output directory
+        progress_path = os.path.join(output_dir, f'.progress-{os.path.basename(args.manifest)}.json')
+        start_row = load_progress(progress_path, args.manifest) if args.resume else 0
+        if start_row:
+            log.info("Resuming %s at row %d", args.manifest, start_row)
+        
+        try:
+            items = read_manifest(args.manifest, start=start_row)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    else:
+        progress_path = None
+        urls = []
+        
+        # Get URLs from file if provided
+        if args.file:
+            try:
+                with open(args.file, 'r') as f:
+                    urls.extend([line.strip() for line in f if line.strip()])
+            except FileNotFoundError:
+                print(f"Error: File {args.file} not found")
+                sys.exit(1)
+        
+        # Add URLs from command line
+        if args.urls:
+            urls.extend(args.urls)
+        
+        # Remove duplicates while preserving order
+        urls = list(dict.fromkeys(urls))
+        
+        if not urls:
+            print("No valid URLs found. Exiting.")
+            sys.exit(1)
+        
+        items = ({"row": row, "url": url} for row, url in enumerate(urls))
+    
+    # Reuse the extracted flame and encoded QR codes across runs if requested
+    configure_caches(args.cache_dir, args.qr_cache)
+    
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    build = BuildManifest(output_dir)
+    # Sheets and archives are rebuilt as a whole, so individual labels are never skipped
+    bundled = bool(args.sheets or args.archive)
+    failures = []
+    skipped = 0
+    # Progress never moves past a failed row, so --resume retries it; rows after
+    # it that did succeed are then skipped through the build manifest
+    first_failed_row = None
+    
+    def record_failure(row, reason):
+        nonlocal first_failed_row
+        failures.append((row, reason))
+        if first_failed_row is None or row < first_failed_row:
+            first_failed_row = row
     
-    print(f"\nGenerated {len(urls)} QR codes in {output_dir}")
+    def save_resume_point(rows_seen):
+        rows_done = rows_seen if first_failed_row is None else min(rows_seen, first_failed_row)
+        save_progress(progress_path, args.manifest, rows_done)
+    
+    # Palette/1-bit labels differ from color ones with the same inputs, so they get their own digests
+    output_format = args.format
+    if args.color_mode != 'color':
+        output_format = f"png-{args.color_mode}-{args.label_px or LABEL_STYLE['final_size']}-{args.flame}"
+    elif sizes:
+        output_format = "png-sizes-" + "-".join(str(size) for size in sizes)
+    
+    rows_read = start_row if args.manifest else 0
+    
+    def make_tasks():
+        nonlocal skipped, rows_read
+        # Command line -m/-d/-s act as defaults for rows that don't set their own
+        for item in items:
+            rows_read = item["row"] + 1
+            if item.get("error"):
+                log.warning("  ✗ Skipping row %s: %s", item["row"], item["error"])
+                record_failure(item["row"], item["error"])
+                continue
+            manufacturer = item.get("manufacturer") or args.manufacturer
+            model = item.get("model") or args.model
+            serial = item.get("serial") or args.serial
+            
+            # Output names are decided here so every worker agrees on them
+            digest = label_digest(logo_path, item["url"], manufacturer, model, serial,
+                                  output_format=output_format)
+            output_path = output_path_for(output_dir, item, digest, args.format)
+            output_paths = [sized_output_path(output_path, size) for size in sizes] if sizes else None
+            
+            # Unchanged inputs -> the existing files are already correct
+            if not bundled and not args.force and all(
+                    build.is_current(path, digest) for path in output_paths or [output_path]):
+                skipped += 1
+                continue
+            
+            yield {
+                "row": item["row"],
+                "logo_path": logo_path,
+                "url": item["url"],
+                "output_path": output_path,
+                "output_paths": output_paths,
+                "sizes": sizes,
+                "digest": digest,
+                "format": args.format,
+                "png_compression": args.png_compression,
+                "color_mode": args.color_mode,
+                "label_px": args.label_px,
+                "flame": args.flame,
+                "manufacturer": manufacturer,
+                "model": model,
+                "serial": serial,
+            }
+    
+    # Generate QR codes for each item; a failed label is reported but doesn't stop the batch
+    created = 0
+    writer = None
+    sink = None
+    verifier = ScanVerifier(args.verify_rate, args.verify_workers or None) if args.verify else None
+    
+    def report_scan_failures(scan_failures):
+        for task, reason in scan_failures:
+            log.error("  ✗ Scan check failed: %s: %s", task["url"], reason)
+            record_failure(task["row"], f"{task['url']}: {reason}")
+            if not bundled:
+                # Render it again next time instead of trusting the recorded digest
+                for path in label_outputs(task):
+                    build.forget(path)
+    
+    started = time.perf_counter()
+    try:
+        if sheet_layout:
+            writer = SheetWriter(output_dir, sheet_layout, args.sheets)
+            results = run_sheets(make_tasks(), writer, jobs, logo_path, args.cache_dir, args.qr_cache,
+                                 verifier)
+        elif args.archive:
+            sink = ArchiveSink(os.path.join(output_dir, args.archive), args.png_compression)
+            results = run_archive(make_tasks(), sink, jobs, logo_path, args.cache_dir, args.qr_cache,
+                                  verifier)
+        else:
+            results = run_files(make_tasks(), jobs, logo_path, args.cache_dir, args.qr_cache, verifier)
+        
+        for task, created_file, error in results:
+            if error:
+                log.error("  ✗ Failed: %s: %s", task["url"], error)
+                record_failure(task["row"], task["url"])
+            else:
+                if task.get("sizes") and len(task["sizes"]) > 1:
+                    log.info("  → Created: %s (+%d sizes)", created_file, len(task["sizes"]) - 1)
+                else:
+                    log.info("  → Created: %s", created_file)
+                created += 1
+                if not bundled:
+                    for path in label_outputs(task):
+                        build.record(path, task["digest"])
+                    if created % BUILD_MANIFEST_SAVE_INTERVAL == 0:
+                        build.save()
+            if verifier:
+                report_scan_failures(verifier.poll())
+            if progress_path:
+                save_resume_point(task["row"] + 1)
+        if verifier:
+            report_scan_failures(verifier.close())
+        if progress_path:
+            # Every row has been handled, including trailing skipped or invalid ones
+            save_resume_point(rows_read)
+    finally:
+        if verifier:
+            verifier.close()
+        # Keep what was rendered even if the run is interrupted
+        build.save()
+        if writer:
+            writer.close()
+        if sink:
+            sink.close()
+        instrumentation.default.flush()
+    elapsed = time.perf_counter() - started
+    
+    instrumentation.count("labels_created", created)
+    instrumentation.count("labels_skipped", skipped)
+    instrumentation.count("labels_failed", len(failures))
+    rate = created / elapsed if elapsed > 0 else 0.0
+    log.info("\nGenerated %d QR codes in %s (%.1f s, %.1f labels/s)", created, output_dir, elapsed, rate)
+    if writer:
+        log.info("Laid out on %d %s sheets in %s", writer.pages_written, args.sheets.upper(), output_dir)
+    if sink:
+        log.info("Archived %d labels in %s", sink.count, sink.path)
+    if skipped:
+        log.info("Skipped %d QR codes whose inputs are unchanged (use --force to re-render)", skipped)
+    if jobs <= 1 and args.qr_cache:
+        stats = qr_cache.default_cache.stats()
+        log.info("QR cache: %d hits, %d misses", stats["hits"] + stats["disk_hits"], stats["misses"])
+    if verifier:
+        log.info("Scan check: %d of %d verified labels decoded to their URL",
+                 verifier.checked - verifier.failed, verifier.checked)
+        instrumentation.count("labels_verified", verifier.checked)
+        instrumentation.count("scan_failures", verifier.failed)
+    if args.stats:
+        print_stats(jobs, rate)
+    if failures:
+        log.error("%d QR codes failed:", len(failures))
+        for row, reason in failures:
+            log.error("  row %s: %s", row, reason)
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
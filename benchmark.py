@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+"""
+Label generation benchmarks
+
+Times each stage of the label pipeline on its own (flame mask extraction, QR
+encoding, flame blend, QR overlay, text drawing, cleanup and PNG write) and the
+end-to-end throughput for batches of synthetic URLs, along with peak memory.
+Each batch size runs in a fresh Python process, so its peak memory is its own
+rather than the high-water mark left by earlier measurements.
+
+Results can be saved as a JSON baseline and later runs compared against it; any
+stage or batch that got slower than the baseline by more than the tolerance is
+reported and the script exits with status 1.
+
+    python benchmark.py --save-baseline benchmark_baseline.json
+    python benchmark.py --compare benchmark_baseline.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+import itertools
+import statistics
+
+import numpy as np
+import cv2
+
+import asset_cache
+import qr_cache
+import instrumentation
+from batch_generate import run_batch
+from qr_generator import (LABEL_STYLE, label_layout, extract_flame_mask, encode_qr_matrix,
+                          rasterize_qr_matrix, blend_flame, overlay_qr_modules, clean_left_margin,
+                          prepare_flame_assets, build_label_template, render_qr_in_flame,
+                          label_digest, label_filename)
+from vertical_text import draw_vertical_text
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is then left out
+    resource = None
+
+DEFAULT_LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'Resources', 'Mary Bird Perkins Cancer Center.png')
+
+# Bump when stages or measurements change so old baselines aren't compared blindly
+BENCHMARK_VERSION = 2
+
+DEFAULT_SIZES = (1, 100, 10000)
+
+def synthetic_url(index):
+    return f"https://www.marybird.org/equipment/bench-{index:06d}"
+
+def peak_rss_mb(children=False):
+    """Peak resident memory so far in MB (None if unavailable)
+
+    ru_maxrss is a high-water mark: for this process, or with children=True for
+    the largest child process that has been waited for (e.g. pool workers).
+    """
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def clear_caches():
+    """Start from cold in-memory caches"""
+    asset_cache.default_cache.clear()
+    qr_cache.default_cache.clear()
+
+def stage_benchmarks(logo_path, scratch_dir):
+    """Return {stage name: zero-argument callable} for the per-stage timings
+
+    Each callable does one unit of work. Stages that are normally cached (QR
+    encoding, rotated text) get fresh inputs on every call so the uncached cost
+    is measured.
+    """
+    layout = label_layout()
+    qr_size = layout["qr_size"]
+    qr_position = (layout["qr_left"], layout["qr_top"])
+    counter = itertools.count()
+
+    flame = prepare_flame_assets(logo_path, layout["flame_size"], layout["flame_color"],
+                                 layout["flame_opacity"])
+    flame_mask = flame["mask_resized"]
+    flame_position = (layout["center"][0] - flame_mask.shape[1] // 2,
+                      layout["center"][1] - flame_mask.shape[0] // 2)
+    template = build_label_template(logo_path)
+    qr_mask = rasterize_qr_matrix(encode_qr_matrix(synthetic_url(0)), qr_size)
+    label = render_qr_in_flame(logo_path, synthetic_url(0), "IBA", "F65-G", "555123")
+    canvas = np.empty_like(template)
+    png_path = os.path.join(scratch_dir, "stage.png")
+
+    side_args = dict(font=layout["side_font"], font_scale=layout["side_font_scale"],
+                     color=layout["side_text_color"], thickness=layout["side_font_thickness"])
+    left_x = layout["qr_left"] - layout["side_margin"]
+    right_x = layout["qr_right"] + layout["side_margin"]
+
+    def mask_extraction():
+        extract_flame_mask(logo_path)
+
+    def qr_encoding():
+        # A new URL each call, so the QR matrix cache never hits
+        encode_qr_matrix(synthetic_url(next(counter)))
+
+    def qr_rasterize():
+        rasterize_qr_matrix(encode_qr_matrix(synthetic_url(0)), qr_size)
+
+    def template_copy():
+        canvas[...] = template
+
+    def flame_blend():
+        canvas[...] = 255
+        blend_flame(canvas, flame_mask, flame_position, layout["flame_color"], layout["flame_opacity"])
+
+    def qr_overlay():
+        overlay_qr_modules(canvas, qr_mask, qr_position)
+
+    def text_drawing():
+        # Typical batch: manufacturer and model repeat, the serial number changes
+        serial = f"Serial: SN{next(counter):08d}"
+        draw_vertical_text(canvas, "MFR: IBA", (left_x, layout["qr_top"] + qr_size // 2),
+                           is_left_side=True, **side_args)
+        draw_vertical_text(canvas, "Model: F65-G", (right_x, layout["qr_top"] + qr_size // 3),
+                           is_left_side=False, **side_args)
+        draw_vertical_text(canvas, serial, (right_x, layout["qr_top"] + qr_size * 2 // 3),
+                           is_left_side=False, **side_args)
+
+    def cleanup():
+        clean_left_margin(canvas, layout["qr_top"], layout["qr_bottom"], layout["qr_left"])
+
+    def png_write():
+        cv2.imwrite(png_path, label)
+
+    return {
+        "mask_extraction": mask_extraction,
+        "qr_encoding": qr_encoding,
+        "qr_rasterize": qr_rasterize,
+        "template_copy": template_copy,
+        "flame_blend": flame_blend,
+        "qr_overlay": qr_overlay,
+        "text_drawing": text_drawing,
+        "cleanup": cleanup,
+        "png_write": png_write,
+    }
+
+def time_stage(func, repeat=5, min_time=0.2):
+    """Time func, returning the median and best per-call time in milliseconds
+
+    The number of calls per round is picked so a round takes at least min_time seconds.
+    """
+    func()  # Warm up
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 10000:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+    return {"ms": statistics.median(rounds) * 1000, "best_ms": min(rounds) * 1000, "calls": number}
+
+def run_throughput(logo_path, count, scratch_dir, jobs=1):
+    """Render count synthetic labels to disk through the batch pipeline from cold caches
+
+    Peak memory is only meaningful if this is the first thing the process does;
+    see run_throughput_isolated.
+    """
+    output_dir = os.path.join(scratch_dir, f"batch_{count}")
+    os.makedirs(output_dir, exist_ok=True)
+    clear_caches()
+
+    def tasks():
+        for row in range(count):
+            url = synthetic_url(row)
+            serial = f"SN{row:08d}"
+            digest = label_digest(logo_path, url, "IBA", "F65-G", serial)
+            yield {
+                "row": row,
+                "logo_path": logo_path,
+                "url": url,
+                "output_path": os.path.join(output_dir, label_filename(digest)),
+                "digest": digest,
+                "format": "png",
+                "manufacturer": "IBA",
+                "model": "F65-G",
+                "serial": serial,
+            }
+
+    failures = 0
+    start = time.perf_counter()
+    for _, _, error in run_batch(tasks(), jobs, logo_path):
+        if error:
+            failures += 1
+    seconds = time.perf_counter() - start
+
+    for name in os.listdir(output_dir):
+        os.remove(os.path.join(output_dir, name))
+    return {
+        "seconds": seconds,
+        "labels_per_sec": count / seconds if seconds > 0 else 0.0,
+        "failures": failures,
+        "peak_rss_mb": peak_rss_mb(),
+        # Pool workers have been joined by now, so they are counted here
+        "workers_peak_rss_mb": peak_rss_mb(children=True) if jobs > 1 else None,
+    }
+
+def run_throughput_isolated(logo_path, count, scratch_dir, jobs=1):
+    """Run run_throughput in a fresh Python process and return its results"""
+    command = [sys.executable, os.path.abspath(__file__), "--throughput-run", str(count),
+               "--logo", logo_path, "--scratch-dir", scratch_dir, "--jobs", str(jobs)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Throughput run for {count} labels failed:\n{completed.stderr.strip()}")
+    return json.loads(completed.stdout)
+
+def environment():
+    return {
+        "benchmark_version": BENCHMARK_VERSION,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "label_size": LABEL_STYLE["final_size"],
+    }
+
+def run_benchmarks(logo_path=DEFAULT_LOGO_PATH, sizes=DEFAULT_SIZES, repeat=5, jobs=1, stages=True):
+    """Run the stage and throughput benchmarks and return the results as a dict"""
+    results = {"environment": environment(), "stages": {}, "throughput": {}}
+    # Measure the quiet render path, as used for large batches
+    instrumentation.configure("silent", timing=False)
+    with tempfile.TemporaryDirectory(prefix="qr-bench-") as scratch_dir:
+        if stages:
+            for name, func in stage_benchmarks(logo_path, scratch_dir).items():
+                results["stages"][name] = time_stage(func, repeat)
+        for count in sorted(sizes):
+            results["throughput"][str(count)] = run_throughput_isolated(logo_path, count, scratch_dir, jobs)
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+def compare(results, baseline, tolerance=0.2, memory_tolerance=0.2):
+    """Compare results against a baseline
+
+    Returns:
+        (lines, regressions): report lines and the list of regressed measurements
+    """
+    lines = []
+    regressions = []
+
+    if baseline.get("environment", {}).get("benchmark_version") != BENCHMARK_VERSION:
+        lines.append("Warning: baseline was recorded by a different benchmark version")
+    for key in ("python", "numpy", "opencv", "machine", "cpus"):
+        old = baseline.get("environment", {}).get(key)
+        new = results["environment"].get(key)
+        if old != new:
+            lines.append(f"Warning: {key} differs from the baseline ({old} -> {new})")
+
+    def check(name, old, new, higher_is_worse, limit):
+        if old is None or new is None or old <= 0:
+            return
+        change = (new - old) / old
+        worse = change > limit if higher_is_worse else -change > limit / (1 + limit)
+        flag = "REGRESSION" if worse else "ok"
+        lines.append(f"  {name:<28} {old:>10.3f} -> {new:>10.3f}  {change:+7.1%}  {flag}")
+        if worse:
+            regressions.append(name)
+
+    for name, current in results["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if old:
+            check(f"stage {name} (ms)", old["ms"], current["ms"], True, tolerance)
+    for count, current in results["throughput"].items():
+        old = baseline.get("throughput", {}).get(count)
+        if old:
+            check(f"{count} labels (labels/s)", old["labels_per_sec"], current["labels_per_sec"],
+                  False, tolerance)
+            check(f"{count} labels peak RSS (MB)", old.get("peak_rss_mb"), current.get("peak_rss_mb"),
+                  True, memory_tolerance)
+            check(f"{count} labels worker RSS (MB)", old.get("workers_peak_rss_mb"),
+                  current.get("workers_peak_rss_mb"), True, memory_tolerance)
+    return lines, regressions
+
+def print_results(results):
+    if results["stages"]:
+        print("Stages (per call):")
+        for name, stage in results["stages"].items():
+            print(f"  {name:<16} {stage['ms']:>9.3f} ms  (best {stage['best_ms']:.3f} ms)")
+    print("Throughput:")
+    for count, run in results["throughput"].items():
+        memory = f", peak RSS {run['peak_rss_mb']:.1f} MB" if run["peak_rss_mb"] is not None else ""
+        if run.get("workers_peak_rss_mb") is not None:
+            memory += f" (workers {run['workers_peak_rss_mb']:.1f} MB)"
+        failed = f", {run['failures']} failed" if run["failures"] else ""
+        print(f"  {count:>6} labels  {run['seconds']:>8.2f} s  "
+              f"{run['labels_per_sec']:>8.1f} labels/s{memory}{failed}")
+
+def parse_sizes(value):
+    try:
+        sizes = [int(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid sizes {value!r} (expected e.g. 1,100,10000)")
+    if any(size < 1 for size in sizes):
+        raise argparse.ArgumentTypeError("Batch sizes must be at least 1")
+    return sizes
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark QR label generation stage by stage')
+    parser.add_argument('--sizes', type=parse_sizes, default=list(DEFAULT_SIZES),
+                        help='Comma-separated batch sizes for the throughput runs (default: 1,100,10000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing rounds per stage (default: 5)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Worker processes for the throughput runs (default: 1)')
+    parser.add_argument('--no-stages', action='store_true', help='Only run the throughput benchmarks')
+    parser.add_argument('-o', '--output', help='Write the results to this JSON file')
+    parser.add_argument('--save-baseline', metavar='PATH', help='Save the results as a baseline')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='Compare against a baseline and exit with status 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed slowdown as a fraction of the baseline (default: 0.2)')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2,
+                        help='Allowed peak memory growth as a fraction of the baseline (default: 0.2)')
+    # Used by run_throughput_isolated to run one batch size in a fresh process
+    parser.add_argument('--throughput-run', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--logo', default=DEFAULT_LOGO_PATH, help=argparse.SUPPRESS)
+    parser.add_argument('--scratch-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.throughput_run:
+        instrumentation.configure("silent", timing=False)
+        result = run_throughput(args.logo, args.throughput_run, args.scratch_dir, args.jobs)
+        json.dump(result, sys.stdout)
+        return
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read baseline {args.compare}: {e}")
+            sys.exit(1)
+
+    results = run_benchmarks(sizes=args.sizes, repeat=args.repeat, jobs=args.jobs,
+                             stages=not args.no_stages)
+    print_results(results)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write("\n")
+            print(f"Results written to {path}")
+
+    if baseline is not None:
+        lines, regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+        print(f"\nCompared with {args.compare} (tolerance {args.tolerance:.0%}):")
+        for line in lines:
+            print(line)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Build manifest for incremental regeneration
+
+Records the input digest (see qr_generator.label_digest) each output file was
+rendered from, so a re-run only renders labels whose inputs have changed.
+"""
+import os
+import json
+
+from atomic_files import atomic_write
+
+MANIFEST_NAME = ".build-manifest.json"
+
+class BuildManifest:
+    """Map of output file name -> input digest, stored as JSON in the output directory
+
+    Args:
+        output_dir: Directory holding the generated labels and the manifest file
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self._entries = {}
+        self._dirty = False
+        try:
+            with open(self.path, "r") as f:
+                self._entries = json.load(f).get("outputs", {})
+        except (OSError, ValueError):
+            pass
+
+    def _key(self, output_path):
+        return os.path.relpath(output_path, self.output_dir)
+
+    def is_current(self, output_path, digest):
+        """True if output_path exists and was rendered from the same inputs"""
+        return (self._entries.get(self._key(output_path)) == digest
+                and os.path.exists(output_path))
+
+    def record(self, output_path, digest):
+        """Note that output_path was rendered from inputs with this digest"""
+        self._entries[self._key(output_path)] = digest
+        self._dirty = True
+
+    def forget(self, output_path):
+        """Drop the record for output_path so the next run renders it again"""
+        if self._entries.pop(self._key(output_path), None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """Write the manifest if anything changed since it was loaded or last saved"""
+        if not self._dirty:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        with atomic_write(self.path) as f:
+            json.dump({"outputs": self._entries}, f, indent=0, sort_keys=True)
+        self._dirty = False
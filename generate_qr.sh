@@ -2,6 +2,7 @@
 
 # Mary Bird Perkins QR Code Generator - Single Mode
 # This script runs the QR code generator for a single URL
+# (for many labels, pipe them into one process: python qr_generator.py --stdin)
 
 # Parameters
 URL="${1:-}"
@@ -29,16 +30,19 @@ echo "Model: $MODEL"
 echo "Serial: $SERIAL"
 echo "Output Path: $OUTPUT_PATH"
 
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+GENERATOR_ARGS=("$SCRIPT_DIR/qr_generator.py" "$URL" -m "$MFR" -d "$MODEL" -s "$SERIAL" -o "$OUTPUT_PATH")
+
 # Try to use conda environment if available
 if command -v conda &> /dev/null && conda info --envs | grep -q "QRC"; then
     # Use conda environment
-    conda run -n QRC python -c "from qr_generator import create_qr_in_flame; import os; logo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Resources', 'Mary Bird Perkins Cancer Center.png'); create_qr_in_flame(logo_path, '$URL', '$OUTPUT_PATH', '$MFR', '$MODEL', '$SERIAL')"
-elif [ -d "$(conda info --base)/envs/QRC" ]; then
+    conda run -n QRC python "${GENERATOR_ARGS[@]}"
+elif command -v conda &> /dev/null && [ -d "$(conda info --base)/envs/QRC" ]; then
     # Use full path to conda environment
-    "$(conda info --base)/envs/QRC/bin/python" -c "from qr_generator import create_qr_in_flame; import os; logo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Resources', 'Mary Bird Perkins Cancer Center.png'); create_qr_in_flame(logo_path, '$URL', '$OUTPUT_PATH', '$MFR', '$MODEL', '$SERIAL')"
+    "$(conda info --base)/envs/QRC/bin/python" "${GENERATOR_ARGS[@]}"
 else
     # Fall back to system Python
-    python -c "from qr_generator import create_qr_in_flame; import os; logo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Resources', 'Mary Bird Perkins Cancer Center.png'); create_qr_in_flame(logo_path, '$URL', '$OUTPUT_PATH', '$MFR', '$MODEL', '$SERIAL')"
+    python "${GENERATOR_ARGS[@]}"
 fi
 
 # Check if generation was successful
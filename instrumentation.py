@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Logging, timing spans and counters for the label pipeline
+
+Library modules log through loggers under "qrcodes" instead of printing, so
+callers choose how much they see. Timing spans and the optional JSON trace are
+off unless enabled with configure(); disabled spans are a shared no-op, so the
+render path does no timing or output work.
+
+The trace file has one Chrome trace event per line ({"name", "ph": "X", "ts",
+"dur", "pid", "tid", "args"}, times in microseconds). Every process appends
+to the same file, so pool workers' spans end up next to the main process's.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import threading
+
+LOGGER_NAME = "qrcodes"
+
+# Level names accepted by configure(); "silent" turns off all log output
+LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "silent": logging.CRITICAL + 10,
+}
+
+# Buffered trace events are appended to the file once this many are pending
+TRACE_FLUSH_EVENTS = 1000
+
+def get_logger(name):
+    """Return the logger for a pipeline module (e.g. "qr_generator")"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("_owner", "_name", "_args", "_start")
+
+    def __init__(self, owner, name, args):
+        self._owner = owner
+        self._name = name
+        self._args = args
+
+    def __enter__(self):
+        self._owner._local.depth = getattr(self._owner._local, "depth", 0) + 1
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        self._owner._local.depth -= 1
+        self._owner._record(self._name, self._start, elapsed, self._args, exc_type is not None)
+        return False
+
+class Instrumentation:
+    """Per-process span timings, counters and trace buffer
+
+    Args:
+        timing: Record spans (needed for timing summaries and the trace)
+        trace_path: JSONL file to append trace events to, or None
+    """
+
+    def __init__(self, timing=False, trace_path=None):
+        self.timing = timing or bool(trace_path)
+        self.trace_path = trace_path
+        self.counters = {}
+        self.spans = {}
+        self._events = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # perf_counter is only meaningful within a process; anchor it to wall-clock time
+        self._epoch = time.time() - time.perf_counter()
+
+    def span(self, name, **args):
+        """Context manager timing a block as the named span (a no-op when timing is off)"""
+        if not self.timing:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name, n=1):
+        """Add n to a named counter"""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def _record(self, name, start, elapsed, args, failed):
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+
+            if self.trace_path:
+                event = {
+                    "name": name, "ph": "X",
+                    "ts": round((self._epoch + start) * 1e6), "dur": round(elapsed * 1e6),
+                    "pid": os.getpid(), "tid": threading.get_ident(),
+                }
+                if args or failed:
+                    event["args"] = dict(args, error=True) if failed else args
+                self._events.append(event)
+
+        # Write whole top-level spans (e.g. one label) at a time
+        if self.trace_path and (self._local.depth == 0 or len(self._events) >= TRACE_FLUSH_EVENTS):
+            self.flush()
+
+    def flush(self):
+        """Append buffered trace events to the trace file"""
+        with self._lock:
+            events, self._events = self._events, []
+        if not events or not self.trace_path:
+            return
+        lines = "".join(json.dumps(event, separators=(",", ":")) + "\n" for event in events)
+        try:
+            with open(self.trace_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError as e:
+            get_logger("instrumentation").warning("Could not write trace %s: %s", self.trace_path, e)
+
+    def reset(self):
+        """Drop recorded spans, counters and unwritten trace events"""
+        with self._lock:
+            self.counters.clear()
+            self.spans.clear()
+            self._events = []
+
+    def summary(self):
+        """Return span timings (count, total/mean/max in ms) and counters as a dict"""
+        with self._lock:
+            spans = {
+                name: {"count": count, "total_ms": total * 1000, "mean_ms": total / count * 1000,
+                       "max_ms": longest * 1000}
+                for name, (count, total, longest) in self.spans.items()
+            }
+        return {"spans": spans, "counters": dict(self.counters)}
+
+# Shared instance used by the pipeline modules
+default = Instrumentation()
+
+def span(name, **args):
+    """Time a block on the shared instance (see Instrumentation.span)"""
+    return default.span(name, **args)
+
+def count(name, n=1):
+    """Increment a counter on the shared instance"""
+    default.count(name, n)
+
+def configure(level=None, timing=None, trace_path=None):
+    """Set the log level and enable span timing or tracing for this process
+
+    Args:
+        level: One of LEVELS ("debug", "info", "warning", "error", "silent")
+        timing: Record spans for a timing summary
+        trace_path: Append trace events to this file (implies timing)
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    if level is not None:
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level {level!r} (expected one of {', '.join(LEVELS)})")
+        logger.setLevel(LEVELS[level])
+        if not logger.handlers:
+            # Plain messages on stdout, like the progress output they replace
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.propagate = False
+    if trace_path is not None:
+        default.trace_path = trace_path
+    if timing is not None or trace_path is not None:
+        default.timing = bool(timing) or bool(default.trace_path)
+
+def settings():
+    """Current configuration as keyword arguments for configure() (e.g. in pool workers)"""
+    level = logging.getLogger(LOGGER_NAME).level
+    name = next((name for name, value in LEVELS.items() if value == level), None)
+    return {"level": name, "timing": default.timing, "trace_path": default.trace_path}
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+"""
+Local label-rendering HTTP service
+
+Keeps the logo, flame and label template warm in a pool of worker processes so
+callers don't pay interpreter start-up and asset loading for every label.
+
+Endpoints:
+    GET  /health                       Service status as JSON
+    GET  /label?url=...&manufacturer=...&model=...&serial=...
+    POST /label   {"url": ..., "manufacturer": ..., "model": ..., "serial": ...}
+                                       A single label as image/png
+    POST /batch   {"labels": [{"url": ...}, ...]}
+                                       JSON {"labels": [{"url": ..., "png": <base64>} or
+                                       {"url": ..., "error": ...}]} in request order
+
+Only binds to localhost by default. Run with:
+    python label_service.py --port 8765 --workers 4
+"""
+import os
+import json
+import base64
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from qr_generator import build_label_template, configure_caches, render_png_bytes
+
+DEFAULT_LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'Resources', 'Mary Bird Perkins Cancer Center.png')
+
+# Request size limits
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+# Seconds a client gets to send its headers, and then its body, before the
+# connection is dropped; idle clients would otherwise hold a connection slot
+READ_TIMEOUT = 30
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    408: "Request Timeout", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def _init_worker(logo_path, cache_dir=None, qr_cache_path=None):
+    # Warm the logo, flame and template once per worker process
+    configure_caches(cache_dir, qr_cache_path)
+    build_label_template(logo_path)
+
+def _label_fields(data):
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Each label must be a JSON object")
+    url = data.get("url")
+    if not url or not isinstance(url, str):
+        raise HTTPError(400, "Missing 'url'")
+    return (url, str(data.get("manufacturer") or ""), str(data.get("model") or ""),
+            str(data.get("serial") or ""))
+
+class LabelService:
+    """asyncio HTTP front end over a bounded process pool of label renderers
+
+    Args:
+        logo_path: Path to the Mary Bird Perkins logo
+        workers: Number of render processes
+        max_pending: Renders allowed to wait for a worker before new work is
+            rejected with 503 (backpressure); defaults to 4 per worker
+        max_batch: Maximum labels accepted in one /batch request. A batch only
+            needs room for its first label; the rest are queued one at a time as
+            earlier renders finish, so batches may be larger than max_pending.
+        max_connections: Maximum concurrently handled connections
+        cache_dir, qr_cache_path: Optional on-disk caches for the workers
+        read_timeout: Seconds allowed for reading a request's headers and body
+    """
+
+    def __init__(self, logo_path=DEFAULT_LOGO_PATH, workers=None, max_pending=None, max_batch=500,
+                 max_connections=64, cache_dir=None, qr_cache_path=None, read_timeout=READ_TIMEOUT):
+        self.logo_path = logo_path
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.max_batch = max_batch
+        self.cache_dir = cache_dir
+        self.qr_cache_path = qr_cache_path
+        self.read_timeout = read_timeout
+        self.rendered = 0
+        self.rejected = 0
+        self._pending = 0
+        self._executor = None
+        self._server = None
+        self._connections = asyncio.Semaphore(max_connections)
+        # Signalled whenever a render finishes, for batches waiting to queue more
+        self._capacity = asyncio.Condition()
+        # Limits renders actually handed to the pool at once
+        self._render_slots = asyncio.Semaphore(self.workers * 2)
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """Start the worker pool and listen; returns the bound (host, port)"""
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker,
+            initargs=(self.logo_path, self.cache_dir, self.qr_cache_path))
+        # Start the workers before listening. Forked lazily on the first render, they
+        # would inherit the listening socket and that request's connection, holding
+        # it open after the response so clients reading to EOF never finish.
+        await asyncio.get_running_loop().run_in_executor(self._executor, os.getpid)
+        self._server = await asyncio.start_server(self._handle_connection, host, port,
+                                                  limit=MAX_HEADER_BYTES)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def _reserve(self, count):
+        # Reject up front instead of queueing unbounded work
+        if self._pending + count > self.max_pending:
+            self.rejected += count
+            raise HTTPError(503, "Renderer busy, retry shortly")
+        self._pending += count
+
+    async def _wait_for_capacity(self):
+        async with self._capacity:
+            await self._capacity.wait_for(lambda: self._pending < self.max_pending)
+        self._pending += 1
+
+    async def _render(self, fields):
+        try:
+            async with self._render_slots:
+                loop = asyncio.get_running_loop()
+                png = await loop.run_in_executor(self._executor, render_png_bytes, self.logo_path, *fields)
+            self.rendered += 1
+            return png
+        finally:
+            self._pending -= 1
+            async with self._capacity:
+                self._capacity.notify_all()
+
+    async def _handle_label(self, fields):
+        self._reserve(1)
+        try:
+            return await self._render(fields)
+        except HTTPError:
+            raise
+        except Exception as e:
+            raise HTTPError(500, f"Failed to render label: {e}")
+
+    async def _handle_batch(self, body):
+        labels = body.get("labels") if isinstance(body, dict) else None
+        if not isinstance(labels, list):
+            raise HTTPError(400, "Expected {\"labels\": [...]}")
+        if len(labels) > self.max_batch:
+            raise HTTPError(413, f"At most {self.max_batch} labels per batch")
+
+        # Validate everything before reserving pool capacity
+        fields = [_label_fields(label) for label in labels]
+        if not fields:
+            return []
+
+        # Reject the batch only if there is no room for its first label; the rest
+        # are queued one at a time as renders finish, never exceeding max_pending
+        self._reserve(1)
+        renders = [asyncio.ensure_future(self._render(fields[0]))]
+        try:
+            for f in fields[1:]:
+                await self._wait_for_capacity()
+                renders.append(asyncio.ensure_future(self._render(f)))
+        finally:
+            # Let queued renders finish (and release capacity) even if the client goes away
+            results = await asyncio.gather(*renders, return_exceptions=True)
+
+        response = []
+        for (url, *_), result in zip(fields, results):
+            if isinstance(result, Exception):
+                response.append({"url": url, "error": str(result)})
+            else:
+                response.append({"url": url, "png": base64.b64encode(result).decode("ascii")})
+        return response
+
+    async def _dispatch(self, method, target, body):
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/") or "/"
+
+        if path == "/health":
+            return 200, "application/json", json.dumps({
+                "status": "ok", "workers": self.workers, "pending": self._pending,
+                "max_pending": self.max_pending, "rendered": self.rendered,
+                "rejected": self.rejected,
+            }).encode("utf-8")
+
+        if path == "/label":
+            if method == "GET":
+                query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                fields = _label_fields(query)
+            elif method == "POST":
+                fields = _label_fields(self._parse_json(body))
+            else:
+                raise HTTPError(405, "Use GET or POST")
+            return 200, "image/png", await self._handle_label(fields)
+
+        if path == "/batch":
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            labels = await self._handle_batch(self._parse_json(body))
+            return 200, "application/json", json.dumps({"labels": labels}).encode("utf-8")
+
+        raise HTTPError(404, f"No such endpoint: {path}")
+
+    @staticmethod
+    def _parse_json(body):
+        try:
+            return json.loads(body.decode("utf-8") or "null")
+        except ValueError as e:
+            raise HTTPError(400, f"Invalid JSON: {e}")
+
+    async def _handle_connection(self, reader, writer):
+        async with self._connections:
+            try:
+                status, content_type, payload = await self._handle_request(reader)
+            except HTTPError as e:
+                status, content_type = e.status, "application/json"
+                payload = json.dumps({"error": e.message}).encode("utf-8")
+            except Exception as e:
+                status, content_type = 500, "application/json"
+                payload = json.dumps({"error": str(e)}).encode("utf-8")
+
+            headers = [
+                f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                f"Content-Type: {content_type}",
+                f"Content-Length: {len(payload)}",
+                "Connection: close",
+            ]
+            if status == 503:
+                headers.append("Retry-After: 1")
+            try:
+                writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("ascii") + payload)
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+    async def _handle_request(self, reader):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.read_timeout)
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Request headers too large")
+        except asyncio.IncompleteReadError:
+            raise HTTPError(400, "Incomplete request")
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "Timed out reading request headers")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        try:
+            body = await asyncio.wait_for(reader.readexactly(length), self.read_timeout) if length else b""
+        except asyncio.IncompleteReadError:
+            raise HTTPError(400, "Incomplete request body")
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "Timed out reading request body")
+        return await self._dispatch(method.upper(), target, body)
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve Mary Bird Perkins QR labels over local HTTP')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('-j', '--workers', type=int, default=0,
+                        help='Render processes (0 = one per CPU core)')
+    parser.add_argument('--max-pending', type=int, help='Queued renders before returning 503')
+    parser.add_argument('--max-batch', type=int, default=500, help='Maximum labels per /batch request')
+    parser.add_argument('--cache-dir', help='Directory to persist prepared logo assets between runs')
+    parser.add_argument('--qr-cache', help='SQLite file to persist encoded QR codes between runs')
+    args = parser.parse_args()
+
+    async def run():
+        service = LabelService(workers=args.workers or None, max_pending=args.max_pending,
+                               max_batch=args.max_batch, cache_dir=args.cache_dir,
+                               qr_cache_path=args.qr_cache)
+        host, port = await service.start(args.host, args.port)
+        print(f"Serving labels on http://{host}:{port} with {service.workers} workers")
+        try:
+            await service.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Stopped")
+
+if __name__ == "__main__":
+    main()
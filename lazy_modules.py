@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+"""
+Deferred loading of heavy dependencies
+
+numpy and OpenCV make up most of the start-up time of a label run. Modules
+bind them with lazy_import(), so they are only loaded when first used and
+paths that never render (argument errors, --help, incremental runs with
+nothing to do) skip the cost.
+"""
+import sys
+import importlib.util
+
+def lazy_import(name):
+    """Return the module name, deferring its execution until an attribute is first used
+
+    A missing module still raises ImportError here, at import time.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Streaming equipment manifests for batch generation
+
+A manifest is a JSONL or CSV file with one label per row. Each row carries its
+own url, manufacturer, model, serial and (optionally) output file name. Rows
+are read one at a time so memory stays flat regardless of file size, and a
+small progress file lets an interrupted run pick up where it stopped.
+"""
+import os
+import csv
+import json
+
+from atomic_files import atomic_write
+from instrumentation import get_logger
+
+log = get_logger("manifest")
+
+# Columns/keys understood in a manifest row
+FIELDS = ("url", "manufacturer", "model", "serial", "output")
+
+def _normalize_row(raw, row):
+    # Accept any capitalization/whitespace in the keys, ignore unknown ones
+    fields = {str(k).strip().lower(): v for k, v in raw.items() if k is not None}
+    item = {"row": row}
+    for name in FIELDS:
+        value = fields.get(name)
+        item[name] = "" if value is None else str(value).strip()
+    return item
+
+# The row readers yield (row, raw dict, error). Rows before start are counted
+# but not parsed, so resuming deep into a large manifest stays cheap.
+
+def _jsonl_rows(f, start=0):
+    row = -1
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        row += 1
+        if row < start:
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            yield row, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(raw, dict):
+            yield row, None, "expected a JSON object"
+            continue
+        yield row, raw, None
+
+def _csv_rows(f, start=0):
+    reader = csv.reader(f)
+    header = next(reader, [])
+    row = -1
+    for values in reader:
+        # Skip completely blank lines; like csv.DictReader, only named columns count
+        values = values[:len(header)]
+        if not any(v.strip() for v in values):
+            continue
+        row += 1
+        if row < start:
+            continue
+        yield row, dict(zip(header, values)), None
+
+def detect_format(path):
+    """Return "jsonl" or "csv" based on the manifest's file extension"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    if ext == ".csv":
+        return "csv"
+    raise ValueError(f"Unknown manifest format for {path} (expected .jsonl or .csv)")
+
+def read_manifest(path, fmt=None, start=0):
+    """Stream label rows from a JSONL or CSV manifest
+
+    Args:
+        path: Manifest file
+        fmt: "jsonl" or "csv" (detected from the extension if None)
+        start: Number of rows to skip, for resuming an interrupted run
+
+    Yields:
+        Dicts with "row" (0-based row number), "url", "manufacturer", "model",
+        "serial" and "output" (empty strings when missing). Rows that can't be
+        parsed or have no url are yielded with an "error" message instead, so
+        row numbers stay aligned with the file.
+    """
+    fmt = fmt or detect_format(path)
+    rows = _jsonl_rows if fmt == "jsonl" else _csv_rows
+
+    # utf-8-sig drops the byte order mark Excel puts at the start of exported CSVs
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        for row, raw, error in rows(f, start):
+            if error:
+                yield {"row": row, "error": error}
+                continue
+            item = _normalize_row(raw, row)
+            if not item["url"]:
+                yield {"row": row, "error": "missing url"}
+                continue
+            yield item
+
+def _manifest_signature(manifest_path):
+    st = os.stat(manifest_path)
+    return {"manifest": os.path.abspath(manifest_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def load_progress(progress_path, manifest_path):
+    """Return the number of rows already completed for this manifest (0 to start over)
+
+    Progress is discarded if it was recorded for a different or modified manifest.
+    """
+    try:
+        with open(progress_path, "r") as f:
+            progress = json.load(f)
+    except (OSError, ValueError):
+        return 0
+
+    recorded = {k: progress.get(k) for k in ("manifest", "size", "mtime_ns")}
+    if recorded != _manifest_signature(manifest_path):
+        log.warning("Ignoring progress file %s: manifest has changed", progress_path)
+        return 0
+    return int(progress.get("rows_done", 0))
+
+def save_progress(progress_path, manifest_path, rows_done):
+    """Record that the first rows_done rows of the manifest are complete"""
+    progress = _manifest_signature(manifest_path)
+    progress["rows_done"] = rows_done
+    with atomic_write(progress_path) as f:
+        json.dump(progress, f)
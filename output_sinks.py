@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Bulk archive output for batch generation
+
+Streams labels into a single zip or tar archive instead of thousands of small
+files. PNG encoding and archive writes run on a background writer thread, so
+they overlap with rendering the next label.
+"""
+import io
+import os
+import time
+import queue
+import tarfile
+import zipfile
+import threading
+
+from qr_generator import encode_png
+
+def archive_format(path):
+    """Return the archive type and tar mode ("zip", None) or ("tar", mode) for a path"""
+    name = path.lower()
+    if name.endswith(".zip"):
+        return "zip", None
+    if name.endswith((".tar.gz", ".tgz")):
+        return "tar", "w:gz"
+    if name.endswith(".tar"):
+        return "tar", "w"
+    raise ValueError(f"Unknown archive type for {path} (expected .zip, .tar, .tar.gz or .tgz)")
+
+class ArchiveSink:
+    """Write labels into a zip/tar archive from a background thread
+
+    Args:
+        path: Archive file (.zip, .tar, .tar.gz or .tgz)
+        png_compression: zlib level 0-9 for labels passed as arrays (None for OpenCV's default)
+        max_queued: Labels allowed to wait for the writer before add() blocks
+    """
+
+    def __init__(self, path, png_compression=None, max_queued=32):
+        self.path = path
+        self.png_compression = png_compression
+        self.count = 0
+        self._kind, tar_mode = archive_format(path)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if self._kind == "zip":
+            # PNGs are already compressed, so store them as-is
+            self._archive = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED)
+        else:
+            self._archive = tarfile.open(path, tar_mode)
+
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="archive-writer", daemon=True)
+        self._thread.start()
+
+    def _write(self, name, data):
+        if self._kind == "zip":
+            self._archive.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = time.time()
+            self._archive.addfile(info, io.BytesIO(data))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                # Keep draining so producers never block on a dead writer
+                continue
+            name, label, data = item
+            try:
+                if data is None:
+                    data = encode_png(label, self.png_compression)
+                self._write(name, data)
+            except Exception as e:
+                self._error = e
+
+    def _check(self):
+        if self._error is not None:
+            raise IOError(f"Writing {self.path} failed: {self._error}")
+
+    def add_label(self, name, label):
+        """Queue a label array; it is PNG-encoded and written on the writer thread"""
+        self._check()
+        self._queue.put((name, label, None))
+        self.count += 1
+
+    def add_bytes(self, name, data):
+        """Queue already-encoded file contents (PNG or SVG bytes)"""
+        self._check()
+        self._queue.put((name, None, data))
+        self.count += 1
+
+    def close(self):
+        """Wait for queued labels to be written and finish the archive"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._archive.close()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
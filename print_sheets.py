@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""
+Print-sheet imposition: tile many labels onto fixed label-stock pages
+
+Pages are filled one at a time and written out as soon as they are full, either
+as individual PNG sheets or as pages of a single PDF, so only one page is ever
+held in memory regardless of how many labels are printed.
+"""
+import os
+import zlib
+
+from lazy_modules import lazy_import
+
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
+
+# Page sizes in inches
+PAGE_SIZES = {
+    "letter": (8.5, 11.0),
+    "legal": (8.5, 14.0),
+    "a4": (8.27, 11.69),
+}
+
+def parse_page_size(value):
+    """Parse a page name ("letter", "a4") or "WxH" in inches into (width, height)"""
+    name = value.strip().lower()
+    if name in PAGE_SIZES:
+        return PAGE_SIZES[name]
+    try:
+        width, height = (float(v) for v in name.split("x"))
+    except ValueError:
+        raise ValueError(f"Unknown page size {value!r} (use {', '.join(PAGE_SIZES)} or WxH in inches)")
+    return width, height
+
+def parse_grid(value):
+    """Parse "COLSxROWS" into (columns, rows)"""
+    try:
+        columns, rows = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Invalid grid {value!r} (expected COLSxROWS, e.g. 3x4)")
+    if columns < 1 or rows < 1:
+        raise ValueError(f"Invalid grid {value!r}: needs at least one column and row")
+    return columns, rows
+
+class SheetLayout:
+    """Geometry of a label sheet in printer pixels
+
+    Args:
+        page_size: (width, height) of the page in inches
+        dpi: Printer resolution
+        columns, rows: Label grid on each page
+        margin: Page margin in inches (all sides)
+
+    Each label fills the largest square that fits its cell, so labels print at the
+    stock's physical size whatever the DPI; they should be rendered at slot_size.
+    """
+
+    def __init__(self, page_size=PAGE_SIZES["letter"], dpi=300, columns=3, rows=4, margin=0.15):
+        self.dpi = dpi
+        self.columns = columns
+        self.rows = rows
+        self.page_width = int(round(page_size[0] * dpi))
+        self.page_height = int(round(page_size[1] * dpi))
+        margin_px = int(round(margin * dpi))
+
+        # Split the printable area into equal cells and center a square slot in each
+        self.cell_width = (self.page_width - 2 * margin_px) // columns
+        self.cell_height = (self.page_height - 2 * margin_px) // rows
+        self.slot_size = min(self.cell_width, self.cell_height)
+        if self.slot_size <= 0:
+            raise ValueError("Margins leave no room for labels on the page")
+        self.margin_px = margin_px
+
+    @property
+    def labels_per_page(self):
+        return self.columns * self.rows
+
+    def slot_origin(self, index):
+        """Top-left pixel of the slot for the index-th label on a page (row-major)"""
+        row, column = divmod(index, self.columns)
+        x = self.margin_px + column * self.cell_width + (self.cell_width - self.slot_size) // 2
+        y = self.margin_px + row * self.cell_height + (self.cell_height - self.slot_size) // 2
+        return x, y
+
+class _PdfStream:
+    """Minimal streaming PDF writer: one full-page RGB image per page
+
+    Objects are written as soon as each page is complete; the page tree and
+    cross-reference table are written on close.
+    """
+
+    def __init__(self, path, dpi):
+        self.dpi = dpi
+        self._file = open(path, "wb")
+        self._offsets = {}
+        self._page_ids = []
+        # Object 1 is the catalog, 2 the page tree (written last)
+        self._next_id = 3
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    def _write_object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f"{obj_id} 0 obj\n".encode("ascii"))
+        self._file.write(body)
+        if stream is not None:
+            self._file.write(b"\nstream\n")
+            self._file.write(stream)
+            self._file.write(b"\nendstream")
+        self._file.write(b"\nendobj\n")
+
+    def _allocate(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def add_page(self, page_bgr):
+        height, width = page_bgr.shape[:2]
+        # Page size in points (1/72 inch)
+        width_pt = width * 72.0 / self.dpi
+        height_pt = height * 72.0 / self.dpi
+
+        image_id, content_id, page_id = self._allocate(), self._allocate(), self._allocate()
+
+        rgb = np.ascontiguousarray(page_bgr[:, :, ::-1])
+        data = zlib.compress(rgb.tobytes(), 6)
+        self._write_object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode "
+            f"/Length {len(data)} >>").encode("ascii"), data)
+
+        content = f"q {width_pt:.2f} 0 0 {height_pt:.2f} 0 0 cm /Im0 Do Q".encode("ascii")
+        self._write_object(content_id, f"<< /Length {len(content)} >>".encode("ascii"), content)
+
+        self._write_object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.2f} {height_pt:.2f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> "
+            f"/Contents {content_id} 0 R >>").encode("ascii"))
+        self._page_ids.append(page_id)
+
+    def close(self):
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>"
+                           .encode("ascii"))
+
+        xref_offset = self._file.tell()
+        self._file.write(f"xref\n0 {self._next_id}\n".encode("ascii"))
+        self._file.write(b"0000000000 65535 f \n")
+        for obj_id in range(1, self._next_id):
+            self._file.write(f"{self._offsets[obj_id]:010d} 00000 n \n".encode("ascii"))
+        self._file.write((f"trailer\n<< /Size {self._next_id} /Root 1 0 R >>\n"
+                          f"startxref\n{xref_offset}\n%%EOF\n").encode("ascii"))
+        self._file.close()
+
+class SheetWriter:
+    """Fill label sheets slot by slot and stream finished pages to disk
+
+    Use current_slot() to draw a label straight into the page, or place() to paste
+    an already rendered label (ideally rendered at slot size; others are resampled).
+
+    Args:
+        output_dir: Directory for the sheets
+        layout: SheetLayout describing the page
+        fmt: "pdf" for a single multi-page PDF, "png" for one PNG per page
+        basename: File name prefix for the sheets
+    """
+
+    def __init__(self, output_dir, layout, fmt="pdf", basename="sheets"):
+        if fmt not in ("pdf", "png"):
+            raise ValueError(f"Unknown sheet format {fmt!r} (expected pdf or png)")
+        self.output_dir = output_dir
+        self.layout = layout
+        self.fmt = fmt
+        self.basename = basename
+        self.pages_written = 0
+        self.labels_placed = 0
+        self.paths = []
+
+        os.makedirs(output_dir, exist_ok=True)
+        self._page = np.full((layout.page_height, layout.page_width, 3), 255, dtype=np.uint8)
+        self._index = 0
+        self._pdf = None
+        if fmt == "pdf":
+            path = os.path.join(output_dir, f"{basename}.pdf")
+            self._pdf = _PdfStream(path, layout.dpi)
+            self.paths.append(path)
+
+    def current_slot(self):
+        """Return a writable view of the next free slot (slot_size x slot_size x 3)"""
+        x, y = self.layout.slot_origin(self._index)
+        size = self.layout.slot_size
+        return self._page[y:y + size, x:x + size]
+
+    def advance(self):
+        """Mark the current slot as used, writing the page out once it is full"""
+        self._index += 1
+        self.labels_placed += 1
+        if self._index == self.layout.labels_per_page:
+            self._flush()
+
+    def clear_slot(self):
+        """Reset the current slot to white (e.g. after a failed render)"""
+        self.current_slot()[...] = 255
+
+    def place(self, label):
+        """Paste a rendered label into the next slot, scaling it to fit if needed"""
+        slot = self.current_slot()
+        if label.shape[:2] != slot.shape[:2]:
+            label = cv2.resize(label, (slot.shape[1], slot.shape[0]), interpolation=cv2.INTER_AREA)
+        slot[...] = label
+        self.advance()
+
+    def _flush(self):
+        if self._index == 0:
+            return
+        if self._pdf is not None:
+            self._pdf.add_page(self._page)
+        else:
+            path = os.path.join(self.output_dir, f"{self.basename}_{self.pages_written + 1:04d}.png")
+            cv2.imwrite(path, self._page)
+            self.paths.append(path)
+        self.pages_written += 1
+
+        # Reuse the page buffer for the next sheet
+        self._page[...] = 255
+        self._index = 0
+
+    def close(self):
+        """Write the last (partial) page and finish the output"""
+        self._flush()
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
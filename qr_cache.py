@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+Memoization of encoded QR module matrices
+
+Encoding (and especially version fitting at ERROR_CORRECT_H) is repeated for
+every reprint of the same URL. Matrices are kept in a bounded in-memory LRU
+and can optionally be persisted to a local SQLite file as packed bit arrays.
+"""
+import os
+import json
+import sqlite3
+from collections import OrderedDict
+
+from instrumentation import get_logger
+from lazy_modules import lazy_import
+
+np = lazy_import("numpy")
+
+log = get_logger("qr_cache")
+
+class QRMatrixCache:
+    """Bounded LRU of QR module matrices, optionally backed by SQLite
+
+    Args:
+        max_entries: Maximum number of matrices kept in memory
+        db_path: SQLite file for persisted matrices, or None for memory only
+    """
+
+    def __init__(self, max_entries=1024, db_path=None):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._conn = None
+        self._conn_pid = None
+
+    def _db(self):
+        # Connections can't be shared with forked worker processes; open one per process
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS qr_matrices "
+                "(key TEXT PRIMARY KEY, modules INTEGER NOT NULL, bits BLOB NOT NULL)")
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _load(self, key):
+        if not self.db_path:
+            return None
+        try:
+            row = self._db().execute(
+                "SELECT modules, bits FROM qr_matrices WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            log.warning("QR cache lookup failed: %s", e)
+            return None
+        if row is None:
+            return None
+        modules, bits = row
+        flat = np.unpackbits(np.frombuffer(bits, dtype=np.uint8), count=modules * modules)
+        return flat.reshape(modules, modules).astype(bool)
+
+    def _save(self, key, matrix):
+        if not self.db_path:
+            return
+        try:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO qr_matrices (key, modules, bits) VALUES (?, ?, ?)",
+                    (key, matrix.shape[0], np.packbits(matrix).tobytes()))
+        except sqlite3.Error as e:
+            log.warning("Could not persist QR matrix: %s", e)
+
+    def get(self, data, error_correction, version, fit, encode):
+        """Return the module matrix for data, calling encode() on a miss
+
+        Args:
+            data: String encoded in the QR code
+            error_correction, version, fit: Encoding policy; part of the cache key
+            encode: Callable returning a square boolean module matrix
+
+        Returns:
+            Read-only boolean matrix (True = black module)
+        """
+        key = json.dumps([data, error_correction, version, fit])
+        matrix = self._entries.get(key)
+        if matrix is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return matrix
+
+        matrix = self._load(key)
+        if matrix is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            matrix = np.asarray(encode(), dtype=bool)
+            self._save(key, matrix)
+
+        # Shared between callers, so guard against accidental modification
+        matrix.flags.writeable = False
+        self._entries[key] = matrix
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return matrix
+
+    def stats(self):
+        """Return hit/miss counters as a dict"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        """Drop all in-memory entries (the SQLite store is left alone)"""
+        self._entries.clear()
+
+# Shared cache used by qr_generator
+default_cache = QRMatrixCache()
+
+def configure(max_entries=None, db_path=None):
+    """Adjust the shared cache's size limit and SQLite store"""
+    if max_entries is not None:
+        default_cache.max_entries = max_entries
+    if db_path is not None:
+        default_cache.db_path = db_path
@@ -1,26 +1,75 @@
 #!/usr/bin/env python
+import io
 import os
-import numpy as np
-import cv2
-import qrcode
-from PIL import Image
+import sys
+import json
+import hashlib
+
+import asset_cache
+import qr_cache
+from instrumentation import get_logger, span
+from lazy_modules import lazy_import
+from vertical_text import FONT_HERSHEY_SIMPLEX, draw_vertical_text, render_rotated_text, paste_sprite
+
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
+
+log = get_logger("qr_generator")
+
+# qrcode.constants.ERROR_CORRECT_H; qrcode itself is only imported to encode a new URL
+ERROR_CORRECT_H = 2
+
+def configure_caches(cache_dir=None, qr_cache_path=None):
+    """Point the asset and QR caches at their on-disk stores, if given"""
+    if cache_dir:
+        asset_cache.configure(cache_dir=cache_dir)
+    if qr_cache_path:
+        qr_cache.configure(db_path=qr_cache_path)
+
+def encode_qr_matrix(url):
+    """Encode the URL and return its module matrix (True = black), including the quiet zone
+
+    Matrices are memoized in qr_cache, so repeat renders of a URL skip encoding.
+    """
+    error_correction = ERROR_CORRECT_H  # Highest error correction
+    version = 4
+
+    def encode():
+        import qrcode
+        qr = qrcode.QRCode(
+            version=version,  
+            error_correction=error_correction,
+            box_size=10,
+            border=4,
+        )
+        qr.add_data(url)
+        qr.make(fit=True)
+        return qr.get_matrix()
+
+    return qr_cache.default_cache.get(url, error_correction, version, True, encode)
+
+def rasterize_qr_matrix(matrix, size):
+    """Expand a QR module matrix to a size x size boolean mask (True = black)
+
+    Every module becomes an integer number of pixels so module edges stay crisp;
+    leftover pixels are split evenly around the code as extra white margin.
+    """
+    modules = matrix.shape[0]
+    scale = size // modules
+    if scale < 1:
+        raise ValueError(f"{size}px is too small for a {modules}x{modules} module QR code")
+
+    mask = np.zeros((size, size), dtype=bool)
+    offset = (size - modules * scale) // 2
+    end = offset + modules * scale
+    mask[offset:end, offset:end] = np.repeat(np.repeat(matrix, scale, axis=0), scale, axis=1)
+    return mask
 
 def generate_qr_code(url, size=300):
     """Generate a QR code for the given URL"""
-    qr = qrcode.QRCode(
-        version=4,  
-        error_correction=qrcode.constants.ERROR_CORRECT_H,  # Highest error correction
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(url)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    img = img.resize((size, size))
-    # Convert to numpy array and ensure it's uint8
-    np_img = np.array(img).astype(np.uint8) * 255
-    return np_img
+    mask = rasterize_qr_matrix(encode_qr_matrix(url), size)
+    # Black modules on white, as a uint8 image
+    return np.where(mask, 0, 255).astype(np.uint8)
 
 def extract_flame_mask(logo_path):
     """Extract the mask of the red flame from the logo"""
@@ -29,13 +78,13 @@ def extract_flame_mask(logo_path):
         logo = cv2.imread(logo_path, cv2.IMREAD_UNCHANGED)
 
         if logo is None:
-            print(f"Failed to load logo from {logo_path}")
+            log.error("Failed to load logo from %s", logo_path)
             # Return a blank mask and image if logo failed to load
             return np.zeros((100, 100), dtype=np.uint8), np.zeros((100, 100, 3), dtype=np.uint8)
 
         # Check image dimensions and channels
         if len(logo.shape) < 2:
-            print(f"Invalid logo format: {logo.shape}")
+            log.error("Invalid logo format: %s", logo.shape)
             return np.zeros((100, 100), dtype=np.uint8), np.zeros((100, 100, 3), dtype=np.uint8)
 
         # Handle grayscale images (2D)
@@ -85,11 +134,698 @@ def extract_flame_mask(logo_path):
         return red_mask, logo
 
     except Exception as e:
-        print(f"Error extracting flame mask: {e}")
+        log.error("Error extracting flame mask: %s", e)
         # Return blank placeholder on error
         return np.zeros((100, 100), dtype=np.uint8), np.zeros((100, 100, 3), dtype=np.uint8)
 
-def create_qr_in_flame(logo_path, url, output_path, manufacturer="", model="", serial=""):
+def blend_flame(result, flame_mask, position, color, opacity=0.7):
+    """Alpha-blend a flame mask onto the canvas in place
+
+    Args:
+        result: BGR canvas to draw on
+        flame_mask: Single-channel mask (0-255) scaled to its final size
+        position: (x, y) of the mask's top-left corner on the canvas
+        color: BGR flame color
+        opacity: Maximum opacity of the flame at full mask intensity
+    """
+    x0, y0 = position
+    # Clip the mask to the canvas
+    h = min(flame_mask.shape[0], result.shape[0] - y0)
+    w = min(flame_mask.shape[1], result.shape[1] - x0)
+    if h <= 0 or w <= 0:
+        return
+    mask = flame_mask[:h, :w]
+    region = result[y0:y0 + h, x0:x0 + w]
+
+    # Only touch pixels covered by the flame, same as the per-pixel blend
+    covered = mask > 0
+    flame_alpha = (mask[covered] / 255.0 * opacity)[:, None]
+    current = region[covered].astype(float)
+    blended = current * (1 - flame_alpha) + np.array(color) * flame_alpha
+    region[covered] = blended.astype(np.uint8)
+
+def overlay_qr_modules(result, qr_black_mask, position):
+    """Paint the black QR modules onto the canvas in place
+
+    Args:
+        result: BGR canvas to draw on
+        qr_black_mask: Boolean mask, True for black modules
+        position: (x, y) of the QR code's top-left corner on the canvas
+    """
+    x0, y0 = position
+    h = min(qr_black_mask.shape[0], result.shape[0] - y0)
+    w = min(qr_black_mask.shape[1], result.shape[1] - x0)
+    if h <= 0 or w <= 0:
+        return
+    region = result[y0:y0 + h, x0:x0 + w]
+    region[qr_black_mask[:h, :w].astype(bool)] = 0
+
+def clean_left_margin(result, qr_top, qr_bottom, qr_left):
+    """Whiten stray non-text pixels in the left margin above and below the QR code
+
+    Rows from qr_top to qr_bottom (inclusive) are left alone so the side text survives.
+    """
+    rows = np.ones(result.shape[0], dtype=bool)
+    rows[qr_top:qr_bottom + 1] = False
+    margin = result[rows, :qr_left]
+
+    # Anything that is neither white nor the red text color is an artifact
+    is_text_color = (margin[:, :, 0] < 150) & (margin[:, :, 1] < 150) & (margin[:, :, 2] > 150)
+    is_white = np.all(margin == 255, axis=2)
+    margin[~is_white & ~is_text_color] = 255
+    result[rows, :qr_left] = margin
+
+# Bump whenever a change alters the rendered pixels. It is part of every label digest and
+# asset cache key, so both cached outputs and assets persisted with --cache-dir are rebuilt.
+RENDERER_VERSION = 2
+
+def _build_flame_assets(logo_path, flame_size, color, opacity):
+    flame_mask, _ = extract_flame_mask(logo_path)
+
+    # Scale the longest side of the flame to flame_size
+    height, width = flame_mask.shape[:2]
+    scale = flame_size / max(height, width)
+    new_logo_height = int(height * scale)
+    new_logo_width = int(width * scale)
+    flame_mask_resized = cv2.resize(flame_mask, (new_logo_width, new_logo_height))
+
+    # Pre-blend the flame onto a white patch; pasting it onto the white canvas
+    # gives the same pixels as blending in place
+    flame_layer = np.ones((new_logo_height, new_logo_width, 3), dtype=np.uint8) * 255
+    blend_flame(flame_layer, flame_mask_resized, (0, 0), color, opacity)
+
+    return {"mask": flame_mask, "mask_resized": flame_mask_resized, "layer": flame_layer}
+
+def prepare_flame_assets(logo_path, flame_size, color=(20, 20, 200), opacity=0.7):
+    """Extract, resize and pre-blend the flame for a logo, reusing cached results
+
+    Assets are keyed by RENDERER_VERSION, logo path, modification time, file size and
+    the requested flame size/color/opacity, so an edited logo is picked up automatically.
+
+    Returns:
+        Dict with "mask" (extracted flame mask), "mask_resized" (mask scaled to
+        flame_size) and "layer" (BGR flame pre-blended on white)
+    """
+    fingerprint = asset_cache.file_fingerprint(logo_path)
+    if fingerprint is None:
+        # Missing logo: extract_flame_mask reports it and returns a blank mask
+        return _build_flame_assets(logo_path, flame_size, color, opacity)
+
+    key = ("flame", RENDERER_VERSION, fingerprint, flame_size, tuple(color), opacity)
+    return asset_cache.default_cache.get(
+        key, lambda: _build_flame_assets(logo_path, flame_size, color, opacity))
+
+# Layout and colors shared by every label. A template is built once per style.
+LABEL_STYLE = {
+    "final_size": 800,            # Slightly smaller final image - optimized for label maker
+    "qr_size": 600,               # Keep QR code size the same for scannability
+    "logo_size_percent": 70,      # Fixed logo size for uniform appearance
+    "flame_color": (20, 20, 200), # BGR for deeper red color, matching NEW-SAMPLE.png
+    "flame_opacity": 0.7,
+    "text_color": (31, 44, 177),  # Red flame color in BGR for header/footer text
+    "side_text_color": (20, 20, 200),
+    "header_top_lines": ("Property of", "Mary Bird Perkins Cancer Center"),
+    "header_bottom_line": "Department of Medical Physics",
+    "header_font": FONT_HERSHEY_SIMPLEX,
+    "header_font_scale": 1.0,
+    "header_font_thickness": 2,
+    "side_font": FONT_HERSHEY_SIMPLEX,
+    "side_font_scale": 0.7,
+    "side_font_thickness": 2,
+    "side_margin": 40,            # Reduced margin to bring side text closer to QR
+}
+
+def label_layout(style=None):
+    """Compute canvas, QR and flame geometry for a style
+
+    Args:
+        style: Dict of overrides for LABEL_STYLE (None for the default label)
+
+    Returns:
+        Dict with the merged style values plus center, qr_top/bottom/left/right
+        and flame_size
+    """
+    layout = dict(LABEL_STYLE)
+    if style:
+        layout.update(style)
+
+    final_size = layout["final_size"]
+    qr_size = layout["qr_size"]
+    center = (final_size // 2, final_size // 2)
+
+    layout["center"] = center
+    layout["qr_left"] = center[0] - qr_size // 2
+    layout["qr_top"] = center[1] - qr_size // 2
+    layout["qr_right"] = layout["qr_left"] + qr_size
+    layout["qr_bottom"] = layout["qr_top"] + qr_size
+    layout["flame_size"] = int(qr_size * (layout["logo_size_percent"] / 100))
+    return layout
+
+def scaled_style(size, style=None):
+    """Return a style that lays the label out at size pixels instead of final_size
+
+    The QR code, margins, fonts and line thicknesses are scaled with the canvas,
+    so a label rendered with it (e.g. at a print sheet's DPI) draws its text and
+    modules at the output resolution instead of being resampled. At the layout's
+    own final_size the result renders identically to style.
+
+    Args:
+        size: Output size in pixels
+        style: Dict of overrides for LABEL_STYLE (None for the default label)
+    """
+    layout = label_layout(style)
+    scale = size / layout["final_size"]
+    scaled = dict(style or {})
+    scaled.update({
+        "final_size": size,
+        "qr_size": int(round(layout["qr_size"] * scale)),
+        "side_margin": int(round(layout["side_margin"] * scale)),
+        "header_font_scale": layout["header_font_scale"] * scale,
+        "header_font_thickness": max(1, int(round(layout["header_font_thickness"] * scale))),
+        "side_font_scale": layout["side_font_scale"] * scale,
+        "side_font_thickness": max(1, int(round(layout["side_font_thickness"] * scale))),
+    })
+    return scaled
+
+def header_lines(layout):
+    """Return (text, baseline_y) for the header and footer lines, centered on the label
+
+    Baselines are offset from the QR code in proportion to the header font scale.
+    """
+    def offset(value):
+        return int(round(value * layout["header_font_scale"]))
+
+    # "Property of" / "Mary Bird Perkins Cancer Center" just above the QR code,
+    # "Department of Medical Physics" just below it
+    top_line1, top_line2 = layout["header_top_lines"]
+    return [(top_line1, layout["qr_top"] - offset(40)),
+            (top_line2, layout["qr_top"] - offset(10)),
+            (layout["header_bottom_line"], layout["qr_bottom"] + offset(30))]
+
+def _draw_header_text(img, layout, color):
+    center = layout["center"]
+    font = layout["header_font"]
+    font_scale = layout["header_font_scale"]
+    thickness = layout["header_font_thickness"]
+
+    for text, baseline_y in header_lines(layout):
+        text_size = cv2.getTextSize(text, font, font_scale, thickness)[0]
+        cv2.putText(img, text, (center[0] - text_size[0] // 2, baseline_y),
+                    font, font_scale, color, thickness)
+
+def _build_label_template(logo_path, layout):
+    final_size = layout["final_size"]
+    center = layout["center"]
+
+    # Create a pristine white background image
+    template = np.ones((final_size, final_size, 3), dtype=np.uint8) * 255
+
+    # Place the pre-blended flame in the center
+    flame_layer = prepare_flame_assets(logo_path, layout["flame_size"],
+                                       color=layout["flame_color"],
+                                       opacity=layout["flame_opacity"])["layer"]
+    flame_height, flame_width = flame_layer.shape[:2]
+    logo_pos_x = center[0] - flame_width // 2
+    logo_pos_y = center[1] - flame_height // 2
+    template[logo_pos_y:logo_pos_y + flame_height, logo_pos_x:logo_pos_x + flame_width] = flame_layer
+
+    # Header and footer text sit outside the QR area, so they can be drawn before the QR
+    _draw_header_text(template, layout, layout["text_color"])
+
+    clean_left_margin(template, layout["qr_top"], layout["qr_bottom"], layout["qr_left"])
+    return {"template": template}
+
+def build_label_template(logo_path, style=None):
+    """Return the static part of a label: white canvas, flame, header and footer
+
+    The template is cached per logo and style, so callers must copy it before
+    drawing on it.
+
+    Args:
+        logo_path: Path to the Mary Bird Perkins logo
+        style: Dict of overrides for LABEL_STYLE (None for the default label)
+    """
+    layout = label_layout(style)
+    fingerprint = asset_cache.file_fingerprint(logo_path)
+    if fingerprint is None:
+        return _build_label_template(logo_path, layout)["template"]
+
+    key = ("template", RENDERER_VERSION, fingerprint, tuple(sorted(layout.items())))
+    return asset_cache.default_cache.get(
+        key, lambda: _build_label_template(logo_path, layout))["template"]
+
+def label_digest(logo_path, url, manufacturer="", model="", serial="", style=None, output_format="png"):
+    """Return a stable digest of everything that affects a label's pixels
+
+    Unlike hash(), this is the same in every process and run, so it can name
+    output files and detect labels whose inputs have not changed.
+    """
+    inputs = {
+        "renderer": RENDERER_VERSION,
+        "logo": asset_cache.file_digest(logo_path),
+        "url": url,
+        "manufacturer": manufacturer,
+        "model": model,
+        "serial": serial,
+        "style": repr(sorted(label_layout(style).items())),
+        "format": output_format,
+    }
+    encoded = json.dumps(inputs, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+def label_filename(digest):
+    """Content-addressed output file name for a label digest"""
+    return f"qr_in_flame_{digest[:16]}.png"
+
+def render_qr_in_flame(logo_path, url, manufacturer="", model="", serial="", style=None, out=None):
+    """Compose a label in memory and return it as a BGR array
+
+    Args:
+        logo_path: Path to the Mary Bird Perkins logo
+        url: URL to encode in the QR code
+        manufacturer: Equipment manufacturer to display on left side
+        model: Model number to display on right side
+        serial: Serial number to display on right side
+        style: Dict of overrides for LABEL_STYLE (None for the default label)
+        out: Optional final_size x final_size x 3 uint8 array, final_size being the
+            style's (e.g. a print-sheet slot with scaled_style), to draw into instead
+            of allocating a new canvas
+    """
+    log.debug("Creating QR code with flame logo from: %s", logo_path)
+    log.debug("URL: %s", url)
+
+    layout = label_layout(style)
+    qr_size = layout["qr_size"]
+    qr_top = layout["qr_top"]
+    qr_bottom = layout["qr_bottom"]
+    qr_left = layout["qr_left"]
+
+    # Step 1: Copy the precomposed template (canvas, flame, header and footer)
+    log.debug("Preparing label template...")
+    with span("template"):
+        template = build_label_template(logo_path, style)
+        if out is None:
+            result = template.copy()
+        else:
+            result = out
+            result[...] = template
+
+    # Step 2: Create the QR code
+    log.debug("Generating QR code...")
+    with span("qr_encode"):
+        qr_black_mask = rasterize_qr_matrix(encode_qr_matrix(url), qr_size)
+
+    # Step 3: Overlay QR code on top of the flame
+    log.debug("Adding QR code...")
+    with span("qr_overlay"):
+        overlay_qr_modules(result, qr_black_mask, (qr_left, qr_top))
+
+    # Step 4: Add the per-item side text
+    log.debug("Adding text...")
+    with span("side_text"):
+        _draw_side_text(result, layout, manufacturer, model, serial)
+
+    # Step 5: Final polish - specifically check for and remove any horizontal lines
+    # The template is already clean; only the manufacturer text reaches the left margin
+    if manufacturer:
+        log.debug("Cleaning up final image...")
+        with span("cleanup"):
+            clean_left_margin(result, qr_top, qr_bottom, qr_left)
+
+    return result
+
+def side_text_lines(layout, manufacturer="", model="", serial="", scale=1):
+    """Place the side text around the QR code
+
+    The manufacturer goes on the left side of the QR code, reading bottom to top.
+    Model and serial go on separate lines in the upper and lower thirds of the
+    right side, reading top to bottom.
+
+    Args:
+        layout: Layout from label_layout
+        manufacturer, model, serial: Side text values (empty strings are skipped)
+        scale: Output size relative to the layout's final_size
+
+    Returns:
+        List of (text, x, y, angle): each line is centered on (x, y) and rotated
+        counter-clockwise by angle degrees (90 on the left, -90 on the right)
+    """
+    def scaled(value):
+        return int(round(value * scale))
+
+    qr_size = scaled(layout["qr_size"])
+    qr_left, qr_top = scaled(layout["qr_left"]), scaled(layout["qr_top"])
+    side_margin = scaled(layout["side_margin"])
+    left_x = qr_left - side_margin
+    right_x = qr_left + qr_size + side_margin
+
+    lines = []
+    if manufacturer:
+        lines.append((f"MFR: {manufacturer.upper()}", left_x, qr_top + qr_size // 2, 90))
+    if model:
+        lines.append((f"Model: {model.upper()}", right_x, qr_top + qr_size // 3, -90))
+    if serial:
+        lines.append((f"Serial: {serial.upper()}", right_x, qr_top + qr_size * 2 // 3, -90))
+    return lines
+
+def _draw_side_text(result, layout, manufacturer, model, serial):
+    side_text_args = dict(font=layout["side_font"], font_scale=layout["side_font_scale"],
+                          color=layout["side_text_color"], thickness=layout["side_font_thickness"])
+    for text, x, y, angle in side_text_lines(layout, manufacturer, model, serial):
+        log.debug("Adding side text: %s", text)
+        draw_vertical_text(result, text, (x, y), is_left_side=angle > 0, **side_text_args)
+
+def png_params(compression=None):
+    """Return the OpenCV imwrite/imencode parameters for a PNG zlib level (None for the default)"""
+    return [] if compression is None else [cv2.IMWRITE_PNG_COMPRESSION, int(compression)]
+
+def encode_png(label, compression=None):
+    """Encode a label array as PNG bytes
+
+    Args:
+        label: BGR (or single-channel) uint8 array
+        compression: zlib level 0-9 (None for OpenCV's default); higher is smaller but slower
+    """
+    ok, encoded = cv2.imencode(".png", label, png_params(compression))
+    if not ok:
+        raise RuntimeError("PNG encoding failed")
+    return encoded.tobytes()
+
+def render_png_bytes(logo_path, url, manufacturer="", model="", serial="", style=None, compression=None):
+    """Compose a label in memory and return it as PNG bytes (see render_qr_in_flame)"""
+    label = render_qr_in_flame(logo_path, url, manufacturer, model, serial, style)
+    return encode_png(label, compression)
+
+def parse_sizes(value):
+    """Parse a comma-separated list of label sizes in pixels (e.g. "800,256,96")
+
+    Duplicates are dropped; the order is kept, so the first size is the primary one.
+    """
+    try:
+        sizes = tuple(dict.fromkeys(int(v) for v in value.split(",") if v.strip()))
+    except ValueError:
+        raise ValueError(f"Invalid sizes {value!r} (expected pixel sizes, e.g. 800,256,96)")
+    if not sizes or min(sizes) < 1:
+        raise ValueError(f"Invalid sizes {value!r}: needs at least one positive size")
+    return sizes
+
+def sized_output_path(output_path, size):
+    """Output file for one size of a multi-size label: name.png -> name_256px.png"""
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}_{size}px{ext or '.png'}"
+
+def label_pyramid(image, smallest):
+    """Return [image, image/2, image/4, ...], halving while a level stays >= smallest pixels
+
+    Each level is box-filtered from the one above, so any size down to smallest
+    is at most one small INTER_AREA resize away from a level.
+    """
+    levels = [image]
+    while min(levels[-1].shape[:2]) // 2 >= smallest:
+        height, width = levels[-1].shape[:2]
+        levels.append(cv2.resize(levels[-1], (width // 2, height // 2), interpolation=cv2.INTER_AREA))
+    return levels
+
+def render_label_sizes(logo_path, url, sizes, manufacturer="", model="", serial="", style=None):
+    """Compose a label once and return it at several sizes as {size: BGR array}
+
+    Layout, side text and the QR encoding are done once at the layout's
+    final_size. The flame and text are scaled down from a pyramid of that
+    composition, and the QR modules are rasterized afresh at an integer module
+    scale for each size, so they stay crisp instead of being resampled. Sizes
+    above final_size are rendered directly with scaled_style rather than
+    enlarged. The final_size output is identical to render_qr_in_flame.
+
+    Args:
+        logo_path, url, manufacturer, model, serial, style: See render_qr_in_flame
+        sizes: Output sizes in pixels
+    """
+    layout = label_layout(style)
+    final_size = layout["final_size"]
+    for size in sizes:
+        if size < 1:
+            raise ValueError(f"Invalid label size {size}px")
+
+    labels = {}
+    smaller = [size for size in sizes if size <= final_size]
+    for size in sizes:
+        if size > final_size:
+            labels[size] = render_qr_in_flame(logo_path, url, manufacturer, model, serial,
+                                              scaled_style(size, style))
+    if not smaller:
+        return labels
+
+    # Everything but the QR modules, at full resolution
+    with span("template"):
+        background = build_label_template(logo_path, style).copy()
+    with span("side_text"):
+        _draw_side_text(background, layout, manufacturer, model, serial)
+    if manufacturer:
+        with span("cleanup"):
+            clean_left_margin(background, layout["qr_top"], layout["qr_bottom"], layout["qr_left"])
+
+    with span("qr_encode"):
+        matrix = encode_qr_matrix(url)
+
+    with span("pyramid"):
+        levels = label_pyramid(background, min(smaller))
+
+    for size in smaller:
+        scale = size / final_size
+        with span("resize"):
+            # Smallest level that is still at least this size
+            level = next(level for level in reversed(levels) if level.shape[0] >= size)
+            if level.shape[0] == size:
+                label = level.copy()
+            else:
+                label = cv2.resize(level, (size, size), interpolation=cv2.INTER_AREA)
+
+        with span("qr_overlay"):
+            qr_size = int(round(layout["qr_size"] * scale))
+            position = (int(round(layout["qr_left"] * scale)), int(round(layout["qr_top"] * scale)))
+            overlay_qr_modules(label, rasterize_qr_matrix(matrix, qr_size), position)
+        labels[size] = label
+    return {size: labels[size] for size in sizes}
+
+# Output directories already known to exist, so repeat saves skip the filesystem check
+_existing_dirs = set()
+
+def _ensure_dir(directory):
+    if directory and directory not in _existing_dirs:
+        os.makedirs(directory, exist_ok=True)
+        _existing_dirs.add(directory)
+
+def save_png(output_path, label, compression=None):
+    """Write a label to a PNG file, creating its directory, and return output_path
+
+    Args:
+        output_path: File to write
+        label: Label array to encode, or already encoded PNG bytes to write as they are
+        compression: zlib level 0-9 for arrays (None for OpenCV's default)
+    """
+    _ensure_dir(os.path.dirname(output_path))
+    if isinstance(label, (bytes, bytearray)):
+        with open(output_path, "wb") as f:
+            f.write(label)
+    elif not cv2.imwrite(output_path, label, png_params(compression)):
+        raise IOError(f"Could not write {output_path}")
+    return output_path
+
+# Compact output modes for label printers: a palette-indexed buffer or a 1-bit buffer
+INDEXED_MODES = ("palette", "1bit")
+FLAME_MODES = ("dither", "outline", "none")
+
+# Palette indices shared by both modes
+INDEX_WHITE, INDEX_BLACK, INDEX_TEXT, INDEX_SIDE_TEXT, INDEX_FLAME = 0, 1, 2, 3, 4
+
+# Number of flame tints in palette mode (indices INDEX_FLAME and up)
+FLAME_TINTS = 8
+
+# Share of flame pixels printed black in 1-bit mode; kept light so the QR stays readable
+MONO_FLAME_DENSITY = 0.3
+
+def _bayer_matrix(order=3):
+    # Ordered-dither thresholds in (0, 1) for a 2**order square tile
+    m = np.zeros((1, 1))
+    for _ in range(order):
+        m = np.block([[4 * m, 4 * m + 2], [4 * m + 3, 4 * m + 1]])
+    return (m + 0.5) / m.size
+
+def indexed_palette(mode, style=None):
+    """Return the palette for an indexed mode as a list of RGB tuples"""
+    if mode == "1bit":
+        return [(255, 255, 255), (0, 0, 0)]
+    layout = label_layout(style)
+    palette = [(255, 255, 255), (0, 0, 0), tuple(reversed(layout["text_color"])),
+               tuple(reversed(layout["side_text_color"]))]
+    # Flame tints: the flame color blended over white at increasing opacity
+    flame_rgb = np.array(tuple(reversed(layout["flame_color"])), dtype=float)
+    for level in range(1, FLAME_TINTS + 1):
+        alpha = layout["flame_opacity"] * level / FLAME_TINTS
+        palette.append(tuple(int(v) for v in 255 * (1 - alpha) + flame_rgb * alpha))
+    return palette
+
+def _build_indexed_template(logo_path, layout, mode, size, flame):
+    final_size = layout["final_size"]
+    scale = size / final_size
+
+    # Flame coverage (0-1) and header text at layout resolution, then scaled to the output size
+    flame_alpha = np.zeros((final_size, final_size), dtype=np.float32)
+    flame_mask = prepare_flame_assets(logo_path, layout["flame_size"], color=layout["flame_color"],
+                                      opacity=layout["flame_opacity"])["mask_resized"]
+    flame_height, flame_width = flame_mask.shape[:2]
+    logo_pos_x = layout["center"][0] - flame_width // 2
+    logo_pos_y = layout["center"][1] - flame_height // 2
+    flame_alpha[logo_pos_y:logo_pos_y + flame_height, logo_pos_x:logo_pos_x + flame_width] = flame_mask / 255.0
+
+    header = np.zeros((final_size, final_size), dtype=np.uint8)
+    _draw_header_text(header, layout, 255)
+
+    if size != final_size:
+        flame_alpha = cv2.resize(flame_alpha, (size, size), interpolation=cv2.INTER_AREA)
+        header = cv2.resize(header, (size, size), interpolation=cv2.INTER_AREA)
+
+    indices = np.zeros((size, size), dtype=np.uint8)
+    if flame == "dither" and mode == "1bit":
+        bayer = _bayer_matrix()
+        reps = (size // bayer.shape[0] + 1, size // bayer.shape[1] + 1)
+        thresholds = np.tile(bayer, reps)[:size, :size]
+        indices[flame_alpha * MONO_FLAME_DENSITY > thresholds] = INDEX_BLACK
+    elif flame == "dither":
+        # Palette mode has real tints, so quantize the coverage instead of dithering
+        levels = np.ceil(flame_alpha * FLAME_TINTS).astype(np.uint8)
+        covered = levels > 0
+        indices[covered] = INDEX_FLAME + levels[covered] - 1
+    elif flame == "outline":
+        solid = (flame_alpha > 0.5).astype(np.uint8)
+        width = max(1, int(round(2 * scale)))
+        edge = solid - cv2.erode(solid, np.ones((2 * width + 1, 2 * width + 1), np.uint8))
+        indices[edge > 0] = INDEX_BLACK if mode == "1bit" else INDEX_FLAME + FLAME_TINTS - 1
+
+    indices[header > 127] = INDEX_BLACK if mode == "1bit" else INDEX_TEXT
+    return {"indices": indices}
+
+def build_indexed_template(logo_path, mode="1bit", size=None, style=None, flame="dither"):
+    """Return the static part of a label as a palette-indexed buffer (see indexed_palette)
+
+    Cached per logo, style, mode, size and flame rendering; copy before drawing on it.
+
+    Args:
+        logo_path: Path to the Mary Bird Perkins logo
+        mode: "palette" or "1bit"
+        size: Output size in pixels (e.g. the label width at the printer's native DPI);
+            defaults to the layout's final_size
+        style: Dict of overrides for LABEL_STYLE (None for the default label)
+        flame: "dither" (ordered dither in 1-bit, tints in palette), "outline" or "none"
+    """
+    if mode not in INDEXED_MODES:
+        raise ValueError(f"Unknown indexed mode {mode!r} (expected one of {INDEXED_MODES})")
+    if flame not in FLAME_MODES:
+        raise ValueError(f"Unknown flame rendering {flame!r} (expected one of {FLAME_MODES})")
+    layout = label_layout(style)
+    size = size or layout["final_size"]
+
+    fingerprint = asset_cache.file_fingerprint(logo_path)
+    if fingerprint is None:
+        return _build_indexed_template(logo_path, layout, mode, size, flame)["indices"]
+
+    key = ("indexed", RENDERER_VERSION, fingerprint, tuple(sorted(layout.items())), mode, size, flame)
+    return asset_cache.default_cache.get(
+        key, lambda: _build_indexed_template(logo_path, layout, mode, size, flame))["indices"]
+
+def _clear_module_centers(region, matrix):
+    # Dither dots in the middle of a light module read as dark to a scanner, so only
+    # keep them along module edges (same module grid as rasterize_qr_matrix)
+    modules = matrix.shape[0]
+    scale = region.shape[0] // modules
+    offset = (region.shape[0] - modules * scale) // 2
+    margin = scale // 4
+    cell = np.zeros((scale, scale), dtype=bool)
+    cell[margin:scale - margin, margin:scale - margin] = True
+    centers = np.tile(cell, (modules, modules))
+    grid = region[offset:offset + modules * scale, offset:offset + modules * scale]
+    grid[centers] = INDEX_WHITE
+
+def render_label_indexed(logo_path, url, manufacturer="", model="", serial="", mode="1bit",
+                         size=None, style=None, flame="dither"):
+    """Compose a label directly into a palette-indexed buffer
+
+    One byte per pixel instead of three, with no color blending. The QR code is
+    rasterized at an integer module scale for the requested size.
+
+    Args:
+        logo_path, url, manufacturer, model, serial, style: See render_qr_in_flame
+        mode, size, flame: See build_indexed_template
+
+    Returns:
+        (indices, palette): uint8 array of palette indices and the RGB palette
+    """
+    layout = label_layout(style)
+    size = size or layout["final_size"]
+    scale = size / layout["final_size"]
+    indices = build_indexed_template(logo_path, mode, size, style, flame).copy()
+
+    def scaled(value):
+        return int(round(value * scale))
+
+    # QR modules
+    qr_size = scaled(layout["qr_size"])
+    matrix = encode_qr_matrix(url)
+    qr_mask = rasterize_qr_matrix(matrix, qr_size)
+    qr_left, qr_top = scaled(layout["qr_left"]), scaled(layout["qr_top"])
+    qr_region = indices[qr_top:qr_top + qr_size, qr_left:qr_left + qr_size]
+    if mode == "1bit":
+        _clear_module_centers(qr_region, matrix)
+    qr_region[qr_mask] = INDEX_BLACK
+
+    # Side text, rendered at the output size so it stays sharp
+    side_index = INDEX_BLACK if mode == "1bit" else INDEX_SIDE_TEXT
+    font_scale = layout["side_font_scale"] * scale
+    thickness = max(1, scaled(layout["side_font_thickness"]))
+    for text, x, y, angle in side_text_lines(layout, manufacturer, model, serial, scale):
+        rendered = render_rotated_text(text, layout["side_font"], font_scale,
+                                       tuple(layout["side_text_color"]), thickness, angle)
+        if rendered is None:
+            continue
+        _, text_mask = rendered
+        # Use the text's coverage as the sprite so it pastes as a single index
+        sprite = np.full(text_mask.shape, side_index, dtype=np.uint8)
+        paste_sprite(indices, sprite, text_mask,
+                     (x - text_mask.shape[1] // 2, y - text_mask.shape[0] // 2))
+
+    return indices, indexed_palette(mode, style)
+
+def encode_indexed_png(indices, palette):
+    """Encode an indexed label as a 1-bit or palette PNG"""
+    if len(palette) == 2:
+        # OpenCV writes true 1-bit PNGs from a black/white grayscale image
+        gray = np.where(indices == INDEX_BLACK, 0, 255).astype(np.uint8)
+        ok, encoded = cv2.imencode(".png", gray, [cv2.IMWRITE_PNG_BILEVEL, 1])
+        if not ok:
+            raise RuntimeError("PNG encoding failed")
+        return encoded.tobytes()
+
+    # OpenCV can't write palette PNGs; Pillow (a qrcode dependency) can
+    from PIL import Image
+    image = Image.fromarray(indices, mode="P")
+    image.putpalette([channel for color in palette for channel in color])
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=False, bits=4 if len(palette) <= 16 else 8)
+    return buffer.getvalue()
+
+def create_label_indexed(logo_path, url, output_path, manufacturer="", model="", serial="",
+                         mode="1bit", size=None, style=None, flame="dither"):
+    """Render a palette or 1-bit label and save it as PNG (see render_label_indexed)"""
+    try:
+        indices, palette = render_label_indexed(logo_path, url, manufacturer, model, serial,
+                                                mode, size, style, flame)
+        return save_png(output_path, encode_indexed_png(indices, palette))
+    except Exception as e:
+        log.error("Error creating %s label: %s", mode, e)
+        raise Exception(f"Failed to create {mode} label: {e}")
+
+def create_qr_in_flame(logo_path, url, output_path, manufacturer="", model="", serial="", style=None,
+                       png_compression=None):
     """Create a QR code that integrates with the logo while maintaining full functionality
 
     Args:
@@ -99,290 +835,45 @@ def create_qr_in_flame(logo_path, url, output_path, manufacturer="", model="", s
         manufacturer: Equipment manufacturer to display on left side
         model: Model number to display on right side
         serial: Serial number to display on right side
+        style: Dict of overrides for LABEL_STYLE (None for the default label)
+        png_compression: zlib level 0-9 for PNG output (None for OpenCV's default)
     """
     try:
-        print(f"Creating QR code with flame logo from: {logo_path}")
-        print(f"URL: {url}")
-        print(f"Output path: {output_path}")
-
-        # Create dimensions - optimize for label maker (more compact)
-        final_size = 800  # Slightly smaller final image
-        qr_size = 600     # Keep QR code size the same for scannability
-
-        # Fixed logo size for uniform appearance
-        logo_size_percent = 70
-
-        # COMPLETE REWRITE APPROACH:
-        # Create a fresh canvas and draw only what we want without any artifacts
-
-        # Step 1: Load and prepare the logo and flame
-        print("Extracting flame mask...")
-        flame_mask, logo_bgr = extract_flame_mask(logo_path)
-
-        # Get dimensions
-        height, width = flame_mask.shape[:2]
-        print(f"Flame mask dimensions: {width}x{height}")
-
-        # Step 2: Create the QR code
-        print("Generating QR code...")
-        qr_image = generate_qr_code(url, size=qr_size)
-        qr_black_mask = (qr_image < 128).astype(np.uint8)
-
-        # Step 3: Create a pristine white background image
-        result = np.ones((final_size, final_size, 3), dtype=np.uint8) * 255
-
-        # Set the flame color - darker red to match NEW-SAMPLE.png
-        flame_color = (20, 20, 200)  # BGR for deeper red color
-
-        # Calculate center and QR code position
-        center = (final_size // 2, final_size // 2)
-        qr_pos_x = center[0] - qr_size // 2
-        qr_pos_y = center[1] - qr_size // 2
-
-        # Define QR boundaries
-        qr_top = qr_pos_y
-        qr_bottom = qr_pos_y + qr_size
-        qr_left = qr_pos_x
-        qr_right = qr_pos_x + qr_size
-
-        # Step 4: Resize the flame to proper size
-        flame_size = int(qr_size * (logo_size_percent/100))
-        scale = flame_size / max(height, width)
-        new_logo_height = int(height * scale)
-        new_logo_width = int(width * scale)
-
-        print(f"Resizing flame to {new_logo_width}x{new_logo_height}")
-
-        # Resize flame mask
-        flame_mask_resized = cv2.resize(flame_mask, (new_logo_width, new_logo_height))
-
-        # Step 5: Place the flame in the center
-        logo_pos_x = center[0] - new_logo_width // 2
-        logo_pos_y = center[1] - new_logo_height // 2
-
-        print(f"Placing flame at position: {logo_pos_x},{logo_pos_y}")
-
-        # Apply flame with semi-transparency
-        print("Applying flame overlay...")
-        for y in range(new_logo_height):
-            for x in range(new_logo_width):
-                if (logo_pos_y + y < final_size and logo_pos_x + x < final_size):
-                    if flame_mask_resized[y, x] > 0:
-                        opacity = 0.7
-                        flame_alpha = flame_mask_resized[y, x] / 255.0 * opacity
-                        current_pixel = result[logo_pos_y + y, logo_pos_x + x].astype(float)
-                        blended = current_pixel * (1 - flame_alpha) + np.array(flame_color) * flame_alpha
-                        result[logo_pos_y + y, logo_pos_x + x] = blended.astype(np.uint8)
-
-        # Step 6: Overlay QR code on top
-        print("Adding QR code...")
-        for y in range(qr_size):
-            for x in range(qr_size):
-                if qr_pos_y + y < final_size and qr_pos_x + x < final_size:
-                    if qr_black_mask[y, x] == 1:  # Black QR module
-                        result[qr_pos_y + y, qr_pos_x + x] = [0, 0, 0]  # Black
-
-        # Step 8: Add the perimeter text as a design element
-        print("Adding text...")
-        # Define Mary Bird Perkins flame color (BGR format) - matching the flame color
-        flame_color = (31, 44, 177)  # Red flame color in BGR (same as used for the flame)
-
-        # Set header font and size - use a more elegant font
-        header_font = cv2.FONT_HERSHEY_SIMPLEX  # Base font
-        header_font_scale = 1.0
-        header_font_thickness = 2
-
-        # Side text font - smaller
-        side_font = cv2.FONT_HERSHEY_SIMPLEX
-        side_font_scale = 0.7
-        side_font_thickness = 1
-
-        # Draw "Property of Mary Bird Perkins Cancer Center" at the top (two lines)
-        top_text1 = "Property of"
-        top_text2 = "Mary Bird Perkins Cancer Center"
-
-        # First line - bring closer to QR code
-        top_text1_size = cv2.getTextSize(top_text1, header_font, header_font_scale, header_font_thickness)[0]
-        top_text1_position = (center[0] - top_text1_size[0] // 2, qr_top - 40)  # Closer to QR
-        cv2.putText(result, top_text1, top_text1_position, header_font, header_font_scale, flame_color, header_font_thickness)
-
-        # Second line - bring closer to QR code
-        top_text2_size = cv2.getTextSize(top_text2, header_font, header_font_scale, header_font_thickness)[0]
-        top_text2_position = (center[0] - top_text2_size[0] // 2, qr_top - 10)  # Very close to QR
-        cv2.putText(result, top_text2, top_text2_position, header_font, header_font_scale, flame_color, header_font_thickness)
-
-        # Draw "Department of Medical Physics" at the bottom - closer to QR
-        bottom_text = "Department of Medical Physics"
-        bottom_text_size = cv2.getTextSize(bottom_text, header_font, header_font_scale, header_font_thickness)[0]
-        bottom_text_position = (center[0] - bottom_text_size[0] // 2, qr_bottom + 30)  # Much closer to QR
-        cv2.putText(result, bottom_text, bottom_text_position, header_font, header_font_scale, flame_color, header_font_thickness)
-
-        # Rotated text for side labels
-        def draw_vertical_text(img, text, position, is_left_side=True, font=cv2.FONT_HERSHEY_SIMPLEX,
-                            font_scale=0.7, color=(20, 20, 200), thickness=2):
-            """Draw properly rotated text matching the NEW-SAMPLE.png
-
-            Args:
-                img: The image to draw on
-                text: Text to draw
-                position: (x, y) position for the center of the text
-                is_left_side: If True, draw on left (90° rotation), otherwise right (-90° rotation)
-                font, font_scale, color, thickness: Text styling parameters
-            """
-            try:
-                x_pos, y_center = position
-
-                # Check that we have valid text
-                if not text:
-                    return
-
-                # Create an image for the text
-                text_size = cv2.getTextSize(text, font, font_scale, thickness)[0]
-
-                # Check that text size is valid
-                if text_size[0] <= 0 or text_size[1] <= 0:
-                    print(f"Invalid text size: {text_size} for text: {text}")
-                    return
-
-                text_img_width = text_size[0] + 40  # Add padding
-                text_img_height = text_size[1] + 40
-
-                # Create blank canvas for the text (white background)
-                text_img = np.ones((text_img_height, text_img_width, 3), dtype=np.uint8) * 255
-
-                # Draw the text centered on this canvas
-                text_x = (text_img_width - text_size[0]) // 2
-                text_y = (text_img_height + text_size[1]) // 2
-                cv2.putText(text_img, text, (text_x, text_y), font, font_scale, color, thickness)
-
-                # Set rotation angle based on side
-                if is_left_side:
-                    # Left side: rotate 90 degrees counter-clockwise
-                    angle = 90
-                else:
-                    # Right side: rotate 90 degrees clockwise
-                    angle = -90
-
-                # Rotate the image
-                rotation_matrix = cv2.getRotationMatrix2D(
-                    (text_img_width // 2, text_img_height // 2), angle, 1)
-
-                # Calculate new dimensions after rotation
-                cosine = abs(rotation_matrix[0, 0])
-                sine = abs(rotation_matrix[0, 1])
-                new_w = int((text_img_height * sine) + (text_img_width * cosine))
-                new_h = int((text_img_height * cosine) + (text_img_width * sine))
-
-                # Adjust the rotation matrix
-                rotation_matrix[0, 2] += (new_w / 2) - (text_img_width // 2)
-                rotation_matrix[1, 2] += (new_h / 2) - (text_img_height // 2)
-
-                # Perform the rotation
-                rotated_text = cv2.warpAffine(text_img, rotation_matrix, (new_w, new_h),
-                                            flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
-                                            borderValue=(255, 255, 255))
-
-                # Calculate position to place the rotated text
-                x_start = x_pos - rotated_text.shape[1] // 2
-                y_start = y_center - rotated_text.shape[0] // 2
-
-                # Paste the rotated text onto the result image
-                # Only copy non-white pixels (text only)
-                for y in range(rotated_text.shape[0]):
-                    for x in range(rotated_text.shape[1]):
-                        if 0 <= y_start + y < img.shape[0] and 0 <= x_start + x < img.shape[1]:
-                            pixel = rotated_text[y, x]
-                            # Only copy text pixels (not white background)
-                            if not np.all(pixel > 250):
-                                img[y_start + y, x_start + x] = pixel
-            except Exception as e:
-                print(f"Error drawing vertical text: {e}")
-
-        # Draw side text with proper rotation, closer to QR code for label maker
-        side_margin = 40  # Reduced margin to bring text closer to QR
-
-        # Left side text (MFR: IBA) - rotate 90 degrees (reads bottom to top)
-        if manufacturer:
-            print(f"Adding manufacturer: {manufacturer}")
-            # Format matches NEW-SAMPLE.png
-            left_text = f"MFR: {manufacturer.upper()}"
-            # Position on the left side of the QR code
-            left_x = qr_left - side_margin
-            left_y = qr_top + qr_size // 2
-
-            # Draw rotated text (90 degrees counter-clockwise)
-            draw_vertical_text(result, left_text, (left_x, left_y), is_left_side=True,
-                            font_scale=0.7, thickness=2)
-
-        # Right side combines model and serial on separate lines
-        if model or serial:
-            # Position for right side text
-            right_x = qr_right + side_margin
-
-            # Always display Model and Serial on separate lines like in the NEW-SAMPLE.png
-            if model:
-                print(f"Adding model: {model}")
-                # Format the model text
-                model_text = f"Model: {model.upper()}"
-                # Position in upper part of QR
-                model_y = qr_top + qr_size // 3
-                # Draw model info separately
-                draw_vertical_text(result, model_text, (right_x, model_y),
-                                is_left_side=False, font_scale=0.7, thickness=2)
-
-            if serial:
-                print(f"Adding serial: {serial}")
-                # Format the serial text
-                serial_text = f"Serial: {serial.upper()}"
-                # Position in lower part of QR (clearly separated from model)
-                serial_y = qr_top + qr_size * 2 // 3
-                # Draw serial info separately
-                draw_vertical_text(result, serial_text, (right_x, serial_y),
-                                is_left_side=False, font_scale=0.7, thickness=2)
-
-            # If there's only one (model or serial), it will be displayed at its respective position
-
-        # Step 9: Final polish - specifically check for and remove any horizontal lines
-        print("Cleaning up final image...")
-        # Check the area to the left of the QR code for any remaining horizontal lines
-        # Horizontal lines might appear around the y=360 mark
-        for y in range(result.shape[0]):
-            # Skip area with QR code
-            if qr_top <= y <= qr_bottom:
-                continue
-
-            # Check the left margin
-            for x in range(0, qr_left):
-                # If pixel is colored but not the flame red color of our text
-                pixel = result[y, x]
-                is_text_color = (pixel[0] < 150 and pixel[1] < 150 and pixel[2] > 150)
-
-                if not np.all(pixel == [255, 255, 255]) and not is_text_color:
-                    # Remove any non-text pixels to clean up potential artifacts
-                    result[y, x] = [255, 255, 255]
-
-        # Step 10: Save the result
-        print(f"Saving final QR code to: {output_path}")
-        # Ensure output directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        cv2.imwrite(output_path, result)
-
-        print("QR code creation complete!")
+        log.debug("Output path: %s", output_path)
+        result = render_qr_in_flame(logo_path, url, manufacturer, model, serial, style)
+
+        # Save the result
+        log.debug("Saving final QR code to: %s", output_path)
+        with span("png_write"):
+            save_png(output_path, result, png_compression)
+
+        log.debug("QR code creation complete!")
         return output_path
 
     except Exception as e:
-        print(f"Error creating QR code with flame: {e}")
+        log.error("Error creating QR code with flame: %s", e)
         raise Exception(f"Failed to create QR code: {e}")
 
-def main():
-    # Define paths
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    logo_path = os.path.join(script_dir, 'Resources', 'Mary Bird Perkins Cancer Center.png')
-    output_dir = os.path.join(script_dir, 'Generated_QR')
-    
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-    
+def create_label_sizes(logo_path, url, output_path, sizes, manufacturer="", model="", serial="",
+                       style=None, png_compression=None):
+    """Render a label at several sizes and save each as a PNG (see render_label_sizes)
+
+    Each size is written to sized_output_path(output_path, size).
+
+    Returns:
+        The written paths, in the order of sizes
+    """
+    try:
+        labels = render_label_sizes(logo_path, url, sizes, manufacturer, model, serial, style)
+        with span("png_write"):
+            return [save_png(sized_output_path(output_path, size), label, png_compression)
+                    for size, label in labels.items()]
+    except Exception as e:
+        log.error("Error creating multi-size label: %s", e)
+        raise Exception(f"Failed to create label sizes: {e}")
+
+def prompt_label():
+    """Ask for a label's URL and equipment details on the terminal"""
     # Example URL (use default for testing or allow user input)
     try:
         url = input("Enter the URL for the QR code (or press Enter for default): ")
@@ -413,13 +904,130 @@ def main():
         serial = ""
         print("No serial number specified")
     
-    # Create output path
-    output_path = os.path.join(output_dir, f'qr_in_flame_{hash(url) % 10000}.png')
-    
-    # Generate the QR code inside the flame
-    created_file = create_qr_in_flame(logo_path, url, output_path, manufacturer, model, serial)
-    
-    print(f"QR code generated successfully at: {created_file}")
+    return {"url": url, "manufacturer": manufacturer, "model": model, "serial": serial}
+
+# Fields of a label read from --stdin, in tab-separated column order
+LABEL_FIELDS = ("url", "manufacturer", "model", "serial", "output")
+
+def parse_label_line(line):
+    """Parse one line of --stdin input into a label dict, or None for a blank line
+
+    A line is either a JSON object with url/manufacturer/model/serial/output, or
+    the same fields tab-separated in that order (trailing fields optional).
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        data = json.loads(line)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        label = {field: str(data.get(field) or "").strip() for field in LABEL_FIELDS}
+    else:
+        values = [value.strip() for value in line.split("\t")]
+        label = dict(zip(LABEL_FIELDS, values + [""] * (len(LABEL_FIELDS) - len(values))))
+    if not label["url"]:
+        raise ValueError("missing url")
+    return label
+
+def main(argv=None):
+    import argparse
+    import instrumentation
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(
+        description='Create QR labels within the Mary Bird Perkins logo flame, several per process')
+    parser.add_argument('urls', nargs='*', help='URLs to encode (prompts for one if none are given)')
+    parser.add_argument('-m', '--manufacturer', default="", help='Equipment manufacturer name')
+    parser.add_argument('-d', '--model', default="", help='Equipment model number')
+    parser.add_argument('-s', '--serial', default="", help='Equipment serial number')
+    parser.add_argument('-o', '--output', help='Output PNG path (only for a single URL)')
+    parser.add_argument('--output-dir', default=os.path.join(script_dir, 'Generated_QR'),
+                        help='Directory for labels without an explicit output (default: Generated_QR)')
+    parser.add_argument('--stdin', action='store_true',
+                        help='Also read labels from standard input, one per line: JSON with '
+                             'url/manufacturer/model/serial/output, or those fields tab-separated')
+    parser.add_argument('--sizes',
+                        help='Write each label at several pixel sizes from one render, e.g. 800,256,96 '
+                             '(files are named NAME_<size>px.png)')
+    parser.add_argument('--cache-dir', help='Directory to persist prepared logo assets between runs')
+    parser.add_argument('--qr-cache', help='SQLite file to persist encoded QR codes between runs')
+    parser.add_argument('--log-level', choices=list(instrumentation.LEVELS), default='warning',
+                        help='Detail of progress output on stdout (default: warning)')
+    args = parser.parse_args(argv)
+
+    if args.output and (args.stdin or len(args.urls) != 1):
+        parser.error("-o/--output needs exactly one URL; use --output-dir for several")
+    sizes = None
+    if args.sizes:
+        try:
+            sizes = parse_sizes(args.sizes)
+        except ValueError as e:
+            parser.error(str(e))
+
+    instrumentation.configure(args.log_level)
+    configure_caches(args.cache_dir, args.qr_cache)
+    logo_path = os.path.join(script_dir, 'Resources', 'Mary Bird Perkins Cancer Center.png')
+
+    def labels():
+        # -m/-d/-s apply to URL arguments and fill in fields a stdin line leaves empty
+        for url in args.urls:
+            yield {"url": url, "output": args.output or ""}
+        if args.stdin:
+            for line_number, line in enumerate(sys.stdin, 1):
+                try:
+                    label = parse_label_line(line)
+                except ValueError as e:
+                    yield {"error": f"line {line_number}: {e}"}
+                    continue
+                if label:
+                    yield label
+
+    interactive = not args.urls and not args.stdin
+    items = [prompt_label()] if interactive else labels()
+
+    failed = 0
+    for item in items:
+        if "error" in item:
+            print(f"Error: {item['error']}", file=sys.stderr)
+            failed += 1
+            continue
+        url = item["url"]
+        manufacturer = item.get("manufacturer") or args.manufacturer
+        model = item.get("model") or args.model
+        serial = item.get("serial") or args.serial
+
+        # Create output path
+        output_path = item.get("output")
+        if not output_path:
+            digest = label_digest(logo_path, url, manufacturer, model, serial)
+            output_path = os.path.join(args.output_dir, label_filename(digest))
+        elif not args.output:
+            # Per-line names live in the output directory and are always PNGs
+            name = f"{os.path.splitext(output_path)[0]}.png"
+            output_path = os.path.join(args.output_dir, name)
+
+        # Generate the QR code inside the flame
+        try:
+            if sizes:
+                created_files = create_label_sizes(logo_path, url, output_path, sizes,
+                                                   manufacturer, model, serial)
+            else:
+                created_files = [create_qr_in_flame(logo_path, url, output_path, manufacturer, model, serial)]
+        except Exception as e:
+            print(f"Error: {url}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+
+        for created_file in created_files:
+            if interactive:
+                print(f"QR code generated successfully at: {created_file}")
+            else:
+                # One path per line, as soon as it exists, for callers reading the output
+                print(created_file, flush=True)
+
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
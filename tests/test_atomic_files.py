@@ -0,0 +1,28 @@
+"""Checks for the atomic file replacement used by manifests, progress files and caches"""
+import os
+import stat
+
+import pytest
+
+from atomic_files import atomic_write
+
+def test_replaces_file_with_umask_permissions(tmp_path):
+    path = tmp_path / "progress.json"
+    path.write_text("old")
+    with atomic_write(str(path)) as f:
+        f.write("new")
+    umask = os.umask(0)
+    os.umask(umask)
+    assert path.read_text() == "new"
+    assert stat.S_IMODE(path.stat().st_mode) == 0o666 & ~umask
+    assert os.listdir(tmp_path) == ["progress.json"]
+
+def test_failed_write_keeps_old_file_and_removes_temp(tmp_path):
+    path = tmp_path / "progress.json"
+    path.write_text("old")
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path)) as f:
+            f.write("partial")
+            raise RuntimeError("interrupted")
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["progress.json"]
@@ -0,0 +1,60 @@
+"""Per-file batch output and where its scan checks read the label from"""
+import os
+
+import numpy as np
+import pytest
+
+from batch_generate import run_files
+from benchmark import DEFAULT_LOGO_PATH
+from verification import check_label
+
+class RecordingVerifier:
+    """Stands in for ScanVerifier, checking every label synchronously"""
+
+    def __init__(self):
+        self.sources = []
+
+    def wants(self, task):
+        return True
+
+    def submit(self, task, source):
+        self.sources.append(source)
+        assert check_label(source, task["url"]) is None
+
+def make_task(tmp_path, row, **options):
+    task = {"row": row, "logo_path": DEFAULT_LOGO_PATH, "url": f"https://a.org/{row}",
+            "output_path": str(tmp_path / f"label{row}.png"), "manufacturer": "IBA", "model": "",
+            "serial": "", "format": "png", "png_compression": None, "color_mode": "color",
+            "label_px": None, "flame": "dither"}
+    task.update(options)
+    return task
+
+@pytest.mark.parametrize("options, source_type", [
+    ({}, np.ndarray),
+    ({"color_mode": "1bit"}, bytes),
+])
+def test_single_process_verifies_the_label_in_memory(tmp_path, options, source_type):
+    tasks = [make_task(tmp_path, row, **options) for row in range(2)]
+    verifier = RecordingVerifier()
+    results = list(run_files(tasks, jobs=1, verifier=verifier))
+    assert [(created, error) for _, created, error in results] == [
+        (task["output_path"], None) for task in tasks]
+    assert all(os.path.exists(task["output_path"]) for task in tasks)
+    assert all(isinstance(source, source_type) for source in verifier.sources)
+    assert len(verifier.sources) == 2
+
+def test_multi_size_labels_verify_the_primary_size(tmp_path):
+    task = make_task(tmp_path, 0, sizes=[800, 256])
+    task["output_paths"] = [str(tmp_path / "label0_800px.png"), str(tmp_path / "label0_256px.png")]
+    verifier = RecordingVerifier()
+    [(_, created, error)] = run_files([task], jobs=1, verifier=verifier)
+    assert (created, error) == (task["output_paths"][0], None)
+    assert all(os.path.exists(path) for path in task["output_paths"])
+    assert verifier.sources[0].shape == (800, 800, 3)
+
+def test_pool_workers_are_verified_from_the_written_file(tmp_path):
+    tasks = [make_task(tmp_path, row) for row in range(2)]
+    verifier = RecordingVerifier()
+    results = list(run_files(tasks, jobs=2, logo_path=DEFAULT_LOGO_PATH, verifier=verifier))
+    assert [error for _, _, error in results] == [None, None]
+    assert verifier.sources == [task["output_path"] for task in tasks]
@@ -0,0 +1,118 @@
+"""
+The vectorized compositing stages against the per-pixel loops they replaced
+
+The reference loops are copied from the original create_qr_in_flame. Each stage
+must produce exactly the same pixels on the same canvas and mask, and be much
+faster; the speed check is relative to the loop, so a slow machine slows both.
+"""
+import time
+
+import numpy as np
+import pytest
+
+import asset_cache
+import qr_cache
+from benchmark import DEFAULT_LOGO_PATH
+from qr_generator import (label_layout, prepare_flame_assets, render_qr_in_flame, encode_qr_matrix,
+                          rasterize_qr_matrix, blend_flame, overlay_qr_modules, clean_left_margin)
+
+# The loops take hundreds of milliseconds per stage against a few for the vectorized
+# versions; anything under this ratio means a stage has fallen back to per-pixel work
+MIN_SPEEDUP = 10
+
+def loop_blend_flame(result, flame_mask_resized, position, flame_color, opacity):
+    logo_pos_x, logo_pos_y = position
+    final_size = result.shape[0]
+    new_logo_height, new_logo_width = flame_mask_resized.shape[:2]
+    for y in range(new_logo_height):
+        for x in range(new_logo_width):
+            if (logo_pos_y + y < final_size and logo_pos_x + x < final_size):
+                if flame_mask_resized[y, x] > 0:
+                    flame_alpha = flame_mask_resized[y, x] / 255.0 * opacity
+                    current_pixel = result[logo_pos_y + y, logo_pos_x + x].astype(float)
+                    blended = current_pixel * (1 - flame_alpha) + np.array(flame_color) * flame_alpha
+                    result[logo_pos_y + y, logo_pos_x + x] = blended.astype(np.uint8)
+
+def loop_overlay_qr_modules(result, qr_black_mask, position):
+    qr_pos_x, qr_pos_y = position
+    final_size = result.shape[0]
+    qr_size = qr_black_mask.shape[0]
+    for y in range(qr_size):
+        for x in range(qr_size):
+            if qr_pos_y + y < final_size and qr_pos_x + x < final_size:
+                if qr_black_mask[y, x] == 1:  # Black QR module
+                    result[qr_pos_y + y, qr_pos_x + x] = [0, 0, 0]  # Black
+
+def loop_clean_left_margin(result, qr_top, qr_bottom, qr_left):
+    for y in range(result.shape[0]):
+        # Skip area with QR code
+        if qr_top <= y <= qr_bottom:
+            continue
+
+        # Check the left margin
+        for x in range(0, qr_left):
+            # If pixel is colored but not the flame red color of our text
+            pixel = result[y, x]
+            is_text_color = (pixel[0] < 150 and pixel[1] < 150 and pixel[2] > 150)
+
+            if not np.all(pixel == [255, 255, 255]) and not is_text_color:
+                # Remove any non-text pixels to clean up potential artifacts
+                result[y, x] = [255, 255, 255]
+
+def stage_inputs():
+    """Return {stage: (vectorized, loop, canvas, args)} on a real label's canvas and masks"""
+    asset_cache.default_cache.clear()
+    qr_cache.default_cache.clear()
+    layout = label_layout()
+    flame_mask = prepare_flame_assets(DEFAULT_LOGO_PATH, layout["flame_size"], layout["flame_color"],
+                                      layout["flame_opacity"])["mask_resized"]
+    flame_position = (layout["center"][0] - flame_mask.shape[1] // 2,
+                      layout["center"][1] - flame_mask.shape[0] // 2)
+    qr_mask = rasterize_qr_matrix(encode_qr_matrix("https://www.marybird.org"), layout["qr_size"])
+    label = render_qr_in_flame(DEFAULT_LOGO_PATH, "https://www.marybird.org", "IBA", "F65-G", "555123")
+
+    # A non-white canvas, so blending and cleanup see every kind of pixel
+    rng = np.random.default_rng(0)
+    noisy = label.copy()
+    speckle = rng.random(noisy.shape[:2]) < 0.05
+    noisy[speckle] = rng.integers(0, 256, (np.count_nonzero(speckle), 3), dtype=np.uint8)
+
+    return {
+        "flame_blend": (blend_flame, loop_blend_flame, noisy,
+                        (flame_mask, flame_position, layout["flame_color"], layout["flame_opacity"])),
+        "qr_overlay": (overlay_qr_modules, loop_overlay_qr_modules, noisy,
+                       (qr_mask, (layout["qr_left"], layout["qr_top"]))),
+        "cleanup": (clean_left_margin, loop_clean_left_margin, noisy,
+                    (layout["qr_top"], layout["qr_bottom"], layout["qr_left"])),
+    }
+
+STAGES = ["flame_blend", "qr_overlay", "cleanup"]
+
+@pytest.fixture(scope="module")
+def inputs():
+    return stage_inputs()
+
+def timed(func, canvas, args, repeat=1):
+    best = None
+    for _ in range(repeat):
+        result = canvas.copy()
+        start = time.perf_counter()
+        func(result, *args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+@pytest.mark.parametrize("stage", STAGES)
+def test_vectorized_stage_matches_loop(inputs, stage):
+    vectorized, loop, canvas, args = inputs[stage]
+    expected, _ = timed(loop, canvas, args)
+    actual, _ = timed(vectorized, canvas, args)
+    assert np.array_equal(actual, expected)
+
+@pytest.mark.parametrize("stage", STAGES)
+def test_vectorized_stage_is_faster_than_loop(inputs, stage):
+    vectorized, loop, canvas, args = inputs[stage]
+    _, loop_time = timed(loop, canvas, args)
+    _, vectorized_time = timed(vectorized, canvas, args, repeat=5)
+    speedup = loop_time / vectorized_time
+    assert speedup >= MIN_SPEEDUP, f"{stage} is only {speedup:.1f}x faster than the per-pixel loop"
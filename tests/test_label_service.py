@@ -0,0 +1,92 @@
+"""The label service end to end, against a server on a free localhost port"""
+import asyncio
+import base64
+import json
+
+import cv2
+import numpy as np
+
+from label_service import LabelService
+
+def run_with_service(check, **options):
+    """Start a one-worker service, await check(port), then shut it down"""
+    async def run():
+        service = LabelService(workers=1, max_pending=1, **options)
+        _, port = await service.start("127.0.0.1", 0)
+        try:
+            return await check(port)
+        finally:
+            await service.close()
+    return asyncio.run(run())
+
+async def send(port, raw, pause=None):
+    """Send a raw request (optionally stalling after it) and return (status, headers, body)"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    if pause:
+        await asyncio.sleep(pause)
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict((name.strip().lower(), value.strip())
+                   for name, value in (line.split(":", 1) for line in lines[1:]))
+    return int(lines[0].split()[1]), headers, body
+
+def post(path, payload):
+    body = json.dumps(payload).encode("utf-8")
+    return (f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n"
+            .encode("ascii") + body)
+
+def decode_qr(png):
+    label = cv2.imdecode(np.frombuffer(png, dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert label is not None
+    return cv2.QRCodeDetector().detectAndDecode(label)[0]
+
+def test_label_returns_a_scannable_png():
+    async def check(port):
+        return await send(port, b"GET /label?url=https://a.org/1&manufacturer=IBA HTTP/1.1\r\n\r\n")
+    status, headers, body = run_with_service(check)
+    assert status == 200
+    assert headers["content-type"] == "image/png"
+    assert decode_qr(body) == "https://a.org/1"
+
+def test_batch_returns_labels_in_request_order():
+    urls = [f"https://a.org/{i}" for i in range(4)]
+    async def check(port):
+        return await send(port, post("/batch", {"labels": [{"url": url} for url in urls]}))
+    # More labels than max_pending: the batch is queued, not rejected
+    status, _, body = run_with_service(check)
+    assert status == 200
+    labels = json.loads(body)["labels"]
+    assert [label["url"] for label in labels] == urls
+    assert [decode_qr(base64.b64decode(label["png"])) for label in labels] == urls
+
+def test_burst_is_rejected_with_retry_after():
+    async def check(port):
+        requests = [send(port, f"GET /label?url=https://a.org/{i} HTTP/1.1\r\n\r\n".encode("ascii"))
+                    for i in range(8)]
+        return await asyncio.gather(*requests)
+    responses = run_with_service(check)
+    statuses = [status for status, _, _ in responses]
+    assert 200 in statuses and 503 in statuses
+    for status, headers, _ in responses:
+        if status == 503:
+            assert headers["retry-after"] == "1"
+
+def test_malformed_content_length_is_a_bad_request():
+    async def check(port):
+        return await send(port, b"POST /label HTTP/1.1\r\nContent-Length: ten\r\n\r\n{}")
+    status, _, body = run_with_service(check)
+    assert status == 400
+    assert json.loads(body)["error"] == "Invalid Content-Length"
+
+def test_stalled_client_times_out():
+    async def check(port):
+        # Headers promise a body that never arrives; then headers that never finish
+        stalled_body = await send(port, b"POST /label HTTP/1.1\r\nContent-Length: 20\r\n\r\n{\"url\"", pause=0.5)
+        stalled_head = await send(port, b"GET /label?url=https://a.org HTTP/1.1\r\n", pause=0.5)
+        return stalled_body, stalled_head
+    for status, _, _ in run_with_service(check, read_timeout=0.2):
+        assert status == 408
@@ -0,0 +1,103 @@
+"""Manifest parsing, resume progress and batch resume after a failed row"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from manifest import read_manifest, load_progress, save_progress
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def write(path, text, encoding="utf-8"):
+    path.write_text(text, encoding=encoding)
+    return str(path)
+
+def test_jsonl_rows(tmp_path):
+    path = write(tmp_path / "m.jsonl",
+                 '{"URL": " https://a.org/1 ", "Manufacturer": "IBA", "serial": 5, "extra": 1}\n'
+                 '\n'
+                 '{"url": "https://a.org/2", "output": "two.png"}\n')
+    assert list(read_manifest(path)) == [
+        {"row": 0, "url": "https://a.org/1", "manufacturer": "IBA", "model": "", "serial": "5",
+         "output": ""},
+        {"row": 1, "url": "https://a.org/2", "manufacturer": "", "model": "", "serial": "",
+         "output": "two.png"},
+    ]
+
+def test_csv_rows_with_byte_order_mark(tmp_path):
+    # Excel's "CSV UTF-8" export starts with a BOM
+    path = write(tmp_path / "m.csv",
+                 "url,Manufacturer,model\nhttps://a.org/1,IBA,F65\n,,\nhttps://a.org/2,,\n",
+                 encoding="utf-8-sig")
+    rows = list(read_manifest(path))
+    assert [(row["row"], row["url"], row["manufacturer"]) for row in rows] == [
+        (0, "https://a.org/1", "IBA"), (1, "https://a.org/2", "")]
+
+def test_bad_rows_keep_row_numbers_aligned(tmp_path):
+    path = write(tmp_path / "m.jsonl",
+                 '{"url": "https://a.org/0"}\n'
+                 '{not json\n'
+                 '["a list"]\n'
+                 '{"model": "no url"}\n'
+                 '{"url": "https://a.org/4"}\n')
+    rows = list(read_manifest(path))
+    assert [row["row"] for row in rows] == [0, 1, 2, 3, 4]
+    assert rows[1]["error"].startswith("invalid JSON")
+    assert rows[2]["error"] == "expected a JSON object"
+    assert rows[3]["error"] == "missing url"
+    assert rows[4]["url"] == "https://a.org/4"
+
+@pytest.mark.parametrize("name, text", [
+    ("m.jsonl", '{"url": "https://a.org/0"}\n{not json\n\n{"url": "https://a.org/2"}\n'
+                '{"url": "https://a.org/3"}\n'),
+    ("m.csv", 'url\nhttps://a.org/0\n"https://a.org/1"\n\nhttps://a.org/2\nhttps://a.org/3\n'),
+])
+def test_start_skips_rows_without_renumbering(tmp_path, name, text):
+    path = write(tmp_path / name, text)
+    assert list(read_manifest(path, start=2)) == list(read_manifest(path))[2:]
+
+def test_skipped_rows_are_not_parsed(tmp_path, monkeypatch):
+    path = write(tmp_path / "m.jsonl", "".join(f'{{"url": "https://a.org/{i}"}}\n' for i in range(10)))
+    parsed = []
+    loads = json.loads
+    monkeypatch.setattr(json, "loads", lambda line: parsed.append(line) or loads(line))
+    assert [row["row"] for row in read_manifest(path, start=8)] == [8, 9]
+    assert len(parsed) == 2
+
+def test_progress_is_discarded_when_the_manifest_changes(tmp_path):
+    path = write(tmp_path / "m.jsonl", '{"url": "https://a.org/0"}\n')
+    progress_path = str(tmp_path / "progress.json")
+    assert load_progress(progress_path, path) == 0
+    save_progress(progress_path, path, 1)
+    assert load_progress(progress_path, path) == 1
+
+    write(tmp_path / "m.jsonl", '{"url": "https://a.org/0"}\n{"url": "https://a.org/1"}\n')
+    assert load_progress(progress_path, path) == 0
+
+def run_batch_generate(*args):
+    return subprocess.run([sys.executable, os.path.join(REPO_DIR, "batch_generate.py"), "-q", *args],
+                          cwd=REPO_DIR, capture_output=True, text=True)
+
+def test_resume_retries_the_first_failed_row(tmp_path):
+    manifest = write(tmp_path / "m.jsonl",
+                     '{"url": "https://a.org/0", "output": "zero.png"}\n'
+                     '{"url": "https://a.org/1", "output": "blocked/one.png"}\n'
+                     '{"url": "https://a.org/2", "output": "two.png"}\n')
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    # A file where row 1 needs a directory makes that row fail
+    (output_dir / "blocked").write_text("")
+    progress_path = output_dir / ".progress-m.jsonl.json"
+
+    result = run_batch_generate("--manifest", manifest, "-o", str(output_dir))
+    assert result.returncode == 1
+    assert (output_dir / "zero.png").exists() and (output_dir / "two.png").exists()
+    assert json.loads(progress_path.read_text())["rows_done"] == 1
+
+    (output_dir / "blocked").unlink()
+    result = run_batch_generate("--manifest", manifest, "-o", str(output_dir), "--resume")
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert (output_dir / "blocked" / "one.png").exists()
+    assert json.loads(progress_path.read_text())["rows_done"] == 3
@@ -0,0 +1,77 @@
+"""
+Golden-image checks for the label renderer
+
+The reference labels in tests/golden/ are the renderer's exact output. A change
+that is meant to alter the pixels must bump qr_generator.RENDERER_VERSION and
+regenerate them:
+
+    UPDATE_GOLDEN=1 python -m pytest tests/test_render.py
+"""
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import asset_cache
+import qr_cache
+from benchmark import DEFAULT_LOGO_PATH
+from qr_generator import LABEL_STYLE, render_qr_in_flame, render_label_sizes, scaled_style
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+# (reference name, url, manufacturer, model, serial)
+GOLDEN_LABELS = [
+    ("full", "https://www.marybird.org", "IBA", "F65-G", "555123"),
+    ("long_url", "https://www.marybird.org/services/radiation-oncology/very/long/path?id=12345&x=abcdef",
+     "Varian", "TrueBeam", ""),
+    ("plain", "https://x.org", "", "", ""),
+]
+
+@pytest.fixture(autouse=True)
+def cold_caches():
+    asset_cache.default_cache.clear()
+    qr_cache.default_cache.clear()
+
+@pytest.mark.parametrize("name, url, manufacturer, model, serial", GOLDEN_LABELS,
+                         ids=[label[0] for label in GOLDEN_LABELS])
+def test_matches_golden_image(name, url, manufacturer, model, serial):
+    label = render_qr_in_flame(DEFAULT_LOGO_PATH, url, manufacturer, model, serial)
+    path = os.path.join(GOLDEN_DIR, f"{name}.png")
+
+    if os.environ.get("UPDATE_GOLDEN"):
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        assert cv2.imwrite(path, label)
+        pytest.skip(f"Updated {path}")
+
+    expected = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    assert expected is not None, f"Missing reference {path} (run with UPDATE_GOLDEN=1 to create it)"
+    assert label.shape == expected.shape
+    differing = np.count_nonzero(np.any(label != expected, axis=2))
+    assert differing == 0, f"{differing} pixels differ from {path}"
+
+def test_multi_size_full_resolution_matches_single_render():
+    _, url, manufacturer, model, serial = GOLDEN_LABELS[0]
+    single = render_qr_in_flame(DEFAULT_LOGO_PATH, url, manufacturer, model, serial)
+    sizes = render_label_sizes(DEFAULT_LOGO_PATH, url, (800, 256), manufacturer, model, serial)
+    assert np.array_equal(sizes[800], single)
+    assert sizes[256].shape == (256, 256, 3)
+
+def test_scaled_style_at_final_size_renders_identically():
+    _, url, manufacturer, model, serial = GOLDEN_LABELS[0]
+    single = render_qr_in_flame(DEFAULT_LOGO_PATH, url, manufacturer, model, serial)
+    scaled = render_qr_in_flame(DEFAULT_LOGO_PATH, url, manufacturer, model, serial,
+                                scaled_style(LABEL_STYLE["final_size"]))
+    assert np.array_equal(scaled, single)
+
+@pytest.mark.parametrize("size", [401, 802, 1605])
+def test_sizes_other_than_final_size_are_drawn_natively(size):
+    _, url, manufacturer, model, serial = GOLDEN_LABELS[0]
+    style = scaled_style(size)
+    out = np.zeros((size, size, 3), dtype=np.uint8)
+    label = render_qr_in_flame(DEFAULT_LOGO_PATH, url, manufacturer, model, serial, style, out=out)
+    assert label is out
+    assert cv2.QRCodeDetector().detectAndDecode(label)[0] == url
+    if size > LABEL_STYLE["final_size"]:
+        sizes = render_label_sizes(DEFAULT_LOGO_PATH, url, (size,), manufacturer, model, serial)
+        assert np.array_equal(sizes[size], label)
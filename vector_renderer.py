@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+Vector (SVG) label renderer
+
+Draws the same layout as qr_generator.render_qr_in_flame, but as vectors: the QR
+modules become merged path runs, the flame a traced outline of the mask from
+extract_flame_mask, and the header and side texts real text. The result is a
+few kilobytes and scales to any print size without resampling.
+"""
+import os
+from functools import lru_cache
+from html import escape
+
+import asset_cache
+from instrumentation import get_logger
+from lazy_modules import lazy_import
+from qr_generator import label_layout, encode_qr_matrix, extract_flame_mask, header_lines, side_text_lines
+
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
+
+log = get_logger("vector_renderer")
+
+# Sans-serif fonts close to the raster Hershey Simplex font
+FONT_FAMILY = "Helvetica, Arial, sans-serif"
+
+# Cap height of typical sans-serif fonts as a fraction of the font size
+CAP_HEIGHT = 0.72
+
+def _svg_color(bgr):
+    b, g, r = bgr
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+def qr_module_path(matrix, size, origin=(0, 0)):
+    """Build SVG path data for the black modules, one rectangle per horizontal run
+
+    Uses the same integer module scale and centering as qr_generator.rasterize_qr_matrix.
+    """
+    modules = matrix.shape[0]
+    scale = size // modules
+    if scale < 1:
+        raise ValueError(f"{size}px is too small for a {modules}x{modules} module QR code")
+    offset = (size - modules * scale) // 2
+    x0 = origin[0] + offset
+    y0 = origin[1] + offset
+
+    commands = []
+    for row in range(modules):
+        # Start/end columns of each run of black modules in this row
+        padded = np.concatenate(([False], matrix[row], [False])).astype(np.int8)
+        edges = np.flatnonzero(np.diff(padded))
+        y = y0 + row * scale
+        for start, end in zip(edges[::2], edges[1::2]):
+            x = x0 + start * scale
+            commands.append(f"M{x} {y}h{(end - start) * scale}v{scale}h{-(end - start) * scale}z")
+    return "".join(commands)
+
+@lru_cache(maxsize=16)
+def _flame_outline(logo_path, fingerprint, flame_size):
+    flame_mask, _ = extract_flame_mask(logo_path)
+    height, width = flame_mask.shape[:2]
+    scale = flame_size / max(height, width)
+
+    # Trace outer outlines and holes; even-odd filling keeps holes open
+    _, binary = cv2.threshold(flame_mask, 127, 255, cv2.THRESH_BINARY)
+    contours, _ = cv2.findContours(binary, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+
+    commands = []
+    for contour in contours:
+        contour = cv2.approxPolyDP(contour, 0.5, True)
+        if len(contour) < 3:
+            continue
+        points = contour.reshape(-1, 2) * scale
+        commands.append("M" + "L".join(f"{x:.1f} {y:.1f}" for x, y in points) + "z")
+    return "".join(commands), int(width * scale), int(height * scale)
+
+def flame_outline_path(logo_path, flame_size):
+    """Return (path data, width, height) of the traced flame scaled to flame_size
+
+    Outlines are cached per logo file and size.
+    """
+    return _flame_outline(logo_path, asset_cache.file_fingerprint(logo_path), flame_size)
+
+def _text_element(text, x, y, font, font_scale, thickness, color, rotate=0, anchor_center=False):
+    # Match the raster text's width and cap height so the layout lines up with the PNG
+    (text_width, text_height), _ = cv2.getTextSize(text, font, font_scale, thickness)
+    font_size = text_height / CAP_HEIGHT
+    attrs = [
+        f'x="{x}"', f'y="{y}"',
+        f'font-size="{font_size:.1f}"',
+        f'textLength="{text_width}"', 'lengthAdjust="spacingAndGlyphs"',
+        'text-anchor="middle"',
+        f'fill="{_svg_color(color)}"',
+    ]
+    if anchor_center:
+        attrs.append('dominant-baseline="central"')
+    if rotate:
+        attrs.append(f'transform="rotate({rotate} {x} {y})"')
+    return f'<text {" ".join(attrs)}>{escape(text, quote=False)}</text>'
+
+def render_label_svg(logo_path, url, manufacturer="", model="", serial="", style=None,
+                     width=None, height=None):
+    """Compose a label as an SVG document
+
+    Args:
+        logo_path: Path to the Mary Bird Perkins logo
+        url: URL to encode in the QR code
+        manufacturer: Equipment manufacturer to display on left side
+        model: Model number to display on right side
+        serial: Serial number to display on right side
+        style: Dict of overrides for qr_generator.LABEL_STYLE (None for the default label)
+        width, height: Physical size of the document (e.g. "2in"); defaults to the
+            label's pixel size
+
+    Returns:
+        SVG document as a string
+    """
+    layout = label_layout(style)
+    final_size = layout["final_size"]
+    qr_size = layout["qr_size"]
+    qr_top = layout["qr_top"]
+    qr_left = layout["qr_left"]
+    center = layout["center"]
+
+    width = width or final_size
+    height = height or final_size
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {final_size} {final_size}">',
+        f'<rect width="{final_size}" height="{final_size}" fill="#ffffff"/>',
+    ]
+
+    # Semi-transparent flame, centered like the raster layer
+    flame_path, flame_width, flame_height = flame_outline_path(logo_path, layout["flame_size"])
+    if flame_path:
+        logo_pos_x = center[0] - flame_width // 2
+        logo_pos_y = center[1] - flame_height // 2
+        parts.append(
+            f'<path transform="translate({logo_pos_x} {logo_pos_y})" d="{flame_path}" '
+            f'fill="{_svg_color(layout["flame_color"])}" fill-opacity="{layout["flame_opacity"]}" '
+            f'fill-rule="evenodd"/>')
+
+    # QR modules on top of the flame
+    qr_path = qr_module_path(encode_qr_matrix(url), qr_size, (qr_left, qr_top))
+    parts.append(f'<path d="{qr_path}" fill="#000000" shape-rendering="crispEdges"/>')
+
+    # Header and footer text
+    parts.append(f'<g font-family="{FONT_FAMILY}">')
+    header_args = (layout["header_font"], layout["header_font_scale"],
+                   layout["header_font_thickness"], layout["text_color"])
+    for text, baseline_y in header_lines(layout):
+        parts.append(_text_element(text, center[0], baseline_y, *header_args))
+
+    # Side text, centered on the same points as the raster layout
+    side_args = (layout["side_font"], layout["side_font_scale"],
+                 layout["side_font_thickness"], layout["side_text_color"])
+    for text, x, y, angle in side_text_lines(layout, manufacturer, model, serial):
+        # SVG rotates clockwise, the raster angle counter-clockwise
+        parts.append(_text_element(text, x, y, *side_args, rotate=-angle, anchor_center=True))
+    parts.append('</g>')
+
+    parts.append('</svg>')
+    return "\n".join(parts) + "\n"
+
+def create_label_svg(logo_path, url, output_path, manufacturer="", model="", serial="", style=None,
+                     width=None, height=None):
+    """Render a label as SVG and write it to output_path
+
+    Args:
+        logo_path, url, manufacturer, model, serial, style, width, height: See render_label_svg
+        output_path: Path where the SVG will be saved
+    """
+    try:
+        svg = render_label_svg(logo_path, url, manufacturer, model, serial, style, width, height)
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(svg)
+        return output_path
+    except Exception as e:
+        log.error("Error creating SVG label: %s", e)
+        raise Exception(f"Failed to create SVG label: {e}")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Rotated text rendering for the side labels (MFR / Model / Serial)
+
+Rotated strings are rendered once into sprites and kept in an LRU cache, since
+the same manufacturer and model strings repeat across many labels.
+"""
+from functools import lru_cache
+
+from instrumentation import get_logger
+from lazy_modules import lazy_import
+
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
+
+# cv2.FONT_HERSHEY_SIMPLEX, as a literal so defining defaults doesn't load OpenCV
+FONT_HERSHEY_SIMPLEX = 0
+
+log = get_logger("vertical_text")
+
+@lru_cache(maxsize=512)
+def render_rotated_text(text, font, font_scale, color, thickness, angle):
+    """Render text on a white canvas and rotate it by angle degrees
+
+    Results are cached and shared, so the returned arrays are read-only.
+
+    Args:
+        text: Text to draw
+        font, font_scale, color, thickness: Text styling parameters (color as a BGR tuple)
+        angle: Rotation in degrees (90 reads bottom to top, -90 top to bottom)
+
+    Returns:
+        (sprite, mask) where sprite is the rotated BGR image and mask is True on text pixels,
+        or None if the text has no size
+    """
+    # Create an image for the text
+    text_size = cv2.getTextSize(text, font, font_scale, thickness)[0]
+
+    # Check that text size is valid
+    if text_size[0] <= 0 or text_size[1] <= 0:
+        log.warning("Invalid text size: %s for text: %s", text_size, text)
+        return None
+
+    text_img_width = text_size[0] + 40  # Add padding
+    text_img_height = text_size[1] + 40
+
+    # Create blank canvas for the text (white background)
+    text_img = np.ones((text_img_height, text_img_width, 3), dtype=np.uint8) * 255
+
+    # Draw the text centered on this canvas
+    text_x = (text_img_width - text_size[0]) // 2
+    text_y = (text_img_height + text_size[1]) // 2
+    cv2.putText(text_img, text, (text_x, text_y), font, font_scale, color, thickness)
+
+    # Rotate the image
+    rotation_matrix = cv2.getRotationMatrix2D(
+        (text_img_width // 2, text_img_height // 2), angle, 1)
+
+    # Calculate new dimensions after rotation
+    cosine = abs(rotation_matrix[0, 0])
+    sine = abs(rotation_matrix[0, 1])
+    new_w = int((text_img_height * sine) + (text_img_width * cosine))
+    new_h = int((text_img_height * cosine) + (text_img_width * sine))
+
+    # Adjust the rotation matrix
+    rotation_matrix[0, 2] += (new_w / 2) - (text_img_width // 2)
+    rotation_matrix[1, 2] += (new_h / 2) - (text_img_height // 2)
+
+    # Perform the rotation
+    sprite = cv2.warpAffine(text_img, rotation_matrix, (new_w, new_h),
+                            flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
+                            borderValue=(255, 255, 255))
+
+    # Only text pixels (not the white background) get pasted
+    mask = ~np.all(sprite > 250, axis=2)
+
+    sprite.flags.writeable = False
+    mask.flags.writeable = False
+    return sprite, mask
+
+def paste_sprite(img, sprite, mask, top_left):
+    """Copy the masked pixels of a sprite onto img, clipped to the image bounds"""
+    x_start, y_start = top_left
+
+    # Overlap between the sprite and the image
+    x0 = max(x_start, 0)
+    y0 = max(y_start, 0)
+    x1 = min(x_start + sprite.shape[1], img.shape[1])
+    y1 = min(y_start + sprite.shape[0], img.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
+
+    sx0, sy0 = x0 - x_start, y0 - y_start
+    sprite_region = sprite[sy0:sy0 + (y1 - y0), sx0:sx0 + (x1 - x0)]
+    mask_region = mask[sy0:sy0 + (y1 - y0), sx0:sx0 + (x1 - x0)]
+    img[y0:y1, x0:x1][mask_region] = sprite_region[mask_region]
+
+def draw_vertical_text(img, text, position, is_left_side=True, font=FONT_HERSHEY_SIMPLEX,
+                       font_scale=0.7, color=(20, 20, 200), thickness=2):
+    """Draw properly rotated text matching the NEW-SAMPLE.png
+
+    Args:
+        img: The image to draw on
+        text: Text to draw
+        position: (x, y) position for the center of the text
+        is_left_side: If True, draw on left (90° rotation), otherwise right (-90° rotation)
+        font, font_scale, color, thickness: Text styling parameters
+    """
+    try:
+        x_pos, y_center = position
+
+        # Check that we have valid text
+        if not text:
+            return
+
+        # Left side reads bottom to top, right side top to bottom
+        angle = 90 if is_left_side else -90
+
+        rendered = render_rotated_text(text, font, font_scale, tuple(color), thickness, angle)
+        if rendered is None:
+            return
+        sprite, mask = rendered
+
+        # Calculate position to place the rotated text
+        x_start = x_pos - sprite.shape[1] // 2
+        y_start = y_center - sprite.shape[0] // 2
+        paste_sprite(img, sprite, mask, (x_start, y_start))
+    except Exception as e:
+        log.error("Error drawing vertical text: %s", e)